@@ -1,39 +1,354 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.read_preferences import Nearest, PrimaryPreferred, ReadPreference, Secondary, SecondaryPreferred
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure, PyMongoError
 import os
+import asyncio
+import bisect
+import codecs
+import contextvars
+import csv
+import io
+import socket
+import threading
+from contextlib import asynccontextmanager
 import logging
+import orjson
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
+from typing import List, Optional, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
 import random
-import razorpay
+import time
+import httpx
 import hmac
 import hashlib
 import jwt
-from passlib.hash import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # only needed when OTP_STORE_URL points at Redis
+    aioredis = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '1'))
+
+class Histogram:
+    # Minimal Prometheus histogram. Observations arrive from Motor's executor
+    # threads as well as the event loop, hence the lock.
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple = METRICS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(snapshot.items()):
+            labels = ",".join(f'{n}="{prometheus_escape(v)}"' for n, v in zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+def prometheus_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+http_request_seconds = Histogram(
+    "brandit_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+mongo_command_seconds = Histogram(
+    "brandit_mongo_command_duration_seconds",
+    "MongoDB command latency by the request route or background task that issued it.",
+    ("operation", "command", "outcome")
+)
+
+class OperationContext:
+    # The request or background task on whose behalf Mongo commands run. Motor
+    # copies the caller's contextvars into its executor threads, so command
+    # listener callbacks see the operation that issued the command.
+    __slots__ = ("name", "scope", "mongo_seconds", "mongo_commands")
+
+    def __init__(self, name: Optional[str] = None, scope: Optional[dict] = None):
+        self.name = name
+        self.scope = scope
+        self.mongo_seconds = 0.0
+        self.mongo_commands = 0
+
+    @property
+    def label(self) -> str:
+        if self.name:
+            return self.name
+        # Routing fills in scope["route"]; the template keeps label cardinality bounded.
+        route = self.scope.get("route") if self.scope else None
+        return getattr(route, "path", None) or "unmatched"
+
+current_operation = contextvars.ContextVar("current_operation", default=None)
+
+def track_background_task(name: str):
+    # Called at the top of a background task; tasks get their own context copy.
+    current_operation.set(OperationContext(f"task:{name}"))
+
+def report_task_death(task: asyncio.Task):
+    # Done-callback: a background task that crashes is logged when it dies,
+    # not only when shutdown gets round to awaiting it.
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("%s background task died", task.get_name(), exc_info=task.exception())
+
+def start_background_task(coro, name: str) -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    task.add_done_callback(report_task_death)
+    return task
+
+async def finish_background_task(task: asyncio.Task):
+    # Waits for a cancelled or stopping task. A crash was already reported by
+    # report_task_death and must not abort the rest of shutdown.
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome: str):
+        seconds = event.duration_micros / 1e6
+        operation = current_operation.get()
+        if operation is not None:
+            operation.mongo_seconds += seconds
+            operation.mongo_commands += 1
+        label = operation.label if operation is not None else "unattributed"
+        mongo_command_seconds.observe(seconds, label, event.command_name, outcome)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        operation = OperationContext(scope=scope)
+        token = current_operation.set(operation)
+        status_code = 500
+        streaming = False
+        
+        async def send_with_status(message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                streaming = content_type.startswith(b"text/event-stream")
+            await send(message)
+        
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_operation.reset(token)
+            # An event stream lasts as long as the client stays connected;
+            # its duration is not a latency.
+            if streaming:
+                return
+            http_request_seconds.observe(elapsed, scope["method"], operation.label, str(status_code))
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                logger.warning(
+                    "Slow request %s %s: %.3fs total, %d Mongo commands taking %.3fs",
+                    scope["method"], scope["path"], elapsed, operation.mongo_commands, operation.mongo_seconds
+                )
+
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+DB_NAME = os.environ['DB_NAME']
+# Per worker: with N workers the deployment opens up to N * MONGO_MAX_POOL_SIZE connections.
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+LEADER_LEASE_SECONDS = float(os.environ.get('LEADER_LEASE_SECONDS', '15'))
+SHUTDOWN_GRACE_SECONDS = float(os.environ.get('SHUTDOWN_GRACE_SECONDS', '10'))
+READ_PREFERENCE = os.environ.get('READ_PREFERENCE', 'secondaryPreferred')
+# The driver rejects anything below 90 seconds.
+READ_MAX_STALENESS_SECONDS = int(os.environ.get('READ_MAX_STALENESS_SECONDS', '90'))
+READ_PREFERENCE_MODES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def make_mongo_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        mongo_url,
+        tz_aware=True,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        event_listeners=[MongoCommandMetrics()]
+    )
+
+def make_read_preference():
+    if READ_PREFERENCE == "primary":
+        return ReadPreference.PRIMARY
+    if READ_PREFERENCE not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown READ_PREFERENCE {READ_PREFERENCE!r}")
+    return READ_PREFERENCE_MODES[READ_PREFERENCE](max_staleness=READ_MAX_STALENESS_SECONDS)
+
+# Connection-owning resources are created by the application lifespan.
+client = None
+db = None
+# Catalog pages, price history and market stats, which tolerate data up to
+# READ_MAX_STALENESS_SECONDS old, read through read_db so replica set
+# secondaries can serve them. Checkout, admin and anything that is read in
+# order to write (the market stats rollup included) stay on db (the primary).
+read_db = None
+
+PRICE_HISTORY_WINDOW = int(os.environ.get('PRICE_HISTORY_WINDOW', '50'))
+PRICE_TICK_RETENTION_DAYS = int(os.environ.get('PRICE_TICK_RETENTION_DAYS', '365'))
+HISTORY_RESOLUTIONS = {
+    "1m": ("minute", 1),
+    "5m": ("minute", 5),
+    "15m": ("minute", 15),
+    "1h": ("hour", 1),
+    "1d": ("day", 1),
+}
+HISTORY_MAX_BUCKETS = 2000
+CATALOG_POLL_INTERVAL = float(os.environ.get('CATALOG_POLL_INTERVAL', '5'))
+# Consecutive change stream failures after which the catalog cache polls instead.
+CATALOG_WATCH_MAX_FAILURES = 5
+CATALOG_RENDER_MAX_AGE = timedelta(seconds=60)
+TICKER_QUEUE_SIZE = int(os.environ.get('TICKER_QUEUE_SIZE', '100'))
+TICKER_HEARTBEAT_SECONDS = 15
+TICKER_MAX_TOPICS = 100
+PAGE_MAX_LIMIT = 500
+BULK_IMPORT_BATCH_SIZE = 1000
+BULK_IMPORT_MAX_ERRORS = 100
+ORDER_MAX_ITEMS = 100
+ORDER_MAX_QUANTITY = 1000
+MARKET_STATS_ROLLUP_SECONDS = float(os.environ.get('MARKET_STATS_ROLLUP_SECONDS', '30'))
+MARKET_TOP_MOVERS = 5
+PURCHASE_EVENTS = ("purchase", "crash_sale")
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '30'))
+OUTBOX_POLL_SECONDS = float(os.environ.get('OUTBOX_POLL_SECONDS', '2'))
+# Claims after which a still-failing event is parked with status "failed".
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '5'))
+# After a wakeup the consumer waits this long so a burst of purchases lands in one batch.
+OUTBOX_COALESCE_SECONDS = float(os.environ.get('OUTBOX_COALESCE_SECONDS', '0.25'))
+PURCHASE_FOLD_ATTEMPTS = 5
+# Recent outbox event ids kept on each product so a redelivered event is a no-op.
+APPLIED_EVENTS_WINDOW = 200
+ADMIN_FIELDS = {"id", "email", "name", "created_at"}
+# Orders embedded in each user_order_summaries document; older ones are paged from orders.
+ORDER_SUMMARY_RECENT = 10
+ORDER_SUMMARY_FIELDS = ("id", "created_at", "payment_status", "total_amount", "products")
+INDEX_AUDIT = os.environ.get('INDEX_AUDIT', 'true').lower() == 'true'
+
+REQUIRED_INDEXES = {
+    "products": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("razorpay_order_id", ASCENDING)]),
+    ],
+    "admins": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("phone_number", ASCENDING)], unique=True),
+    ],
+    "price_ticks": [
+        IndexModel([("product_id", ASCENDING), ("timestamp", ASCENDING)]),
+    ],
+    "price_outbox": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+}
+
+# Indexes earlier releases created that are no longer wanted; dropped at startup.
+OBSOLETE_INDEXES = {
+    "users": ["otp_expiry_ttl"],
+}
+
+# (collection, filter, sort key); the leader explains each once and logs the plan.
+HOT_QUERIES = [
+    ("products", {"id": ""}, None),
+    ("orders", {"id": ""}, None),
+    ("orders", {"user_id": ""}, None),
+    ("admins", {"id": ""}, None),
+    ("admins", {"email": ""}, None),
+    ("users", {"phone_number": ""}, None),
+    ("user_order_summaries", {"_id": ""}, None),
+    ("price_outbox", {"$or": [{"status": "pending"}, {"status": "processing", "lease_until": {"$lt": ""}}]}, "created_at"),
+]
 
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 razorpay_key_id = os.environ.get('RAZORPAY_KEY_ID', '')
 razorpay_key_secret = os.environ.get('RAZORPAY_KEY_SECRET', '')
-razorpay_client = razorpay.Client(auth=(razorpay_key_id, razorpay_key_secret)) if razorpay_key_id else None
+PAYMENT_GATEWAY = os.environ.get('PAYMENT_GATEWAY', 'razorpay' if razorpay_key_id else 'fake').lower()
+PAYMENT_TIMEOUT_SECONDS = float(os.environ.get('PAYMENT_TIMEOUT_SECONDS', '5'))
+PAYMENT_MAX_RETRIES = int(os.environ.get('PAYMENT_MAX_RETRIES', '2'))
+PAYMENT_POOL_SIZE = int(os.environ.get('PAYMENT_POOL_SIZE', '20'))
+PAYMENT_BREAKER_THRESHOLD = int(os.environ.get('PAYMENT_BREAKER_THRESHOLD', '5'))
+PAYMENT_BREAKER_RESET_SECONDS = float(os.environ.get('PAYMENT_BREAKER_RESET_SECONDS', '30'))
+FAKE_GATEWAY_LATENCY_MS = float(os.environ.get('FAKE_GATEWAY_LATENCY_MS', '0'))
 
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '32'))
+ADMIN_CACHE_TTL_SECONDS = float(os.environ.get('ADMIN_CACHE_TTL_SECONDS', '60'))
+# Stateless mode trusts the signed claims alone: deleting an admin or changing
+# a password does not revoke tokens that were already issued.
+ADMIN_AUTH_STATELESS = os.environ.get('ADMIN_AUTH_STATELESS', 'false').lower() == 'true'
+# Empty keeps OTPs in process memory (single worker); redis://... shares them.
+OTP_STORE_URL = os.environ.get('OTP_STORE_URL', '')
+OTP_TTL_SECONDS = int(os.environ.get('OTP_TTL_SECONDS', '600'))
+# Token buckets as (burst, seconds per refilled token).
+OTP_SEND_PHONE_LIMIT = (3, 60.0)
+OTP_SEND_IP_LIMIT = (20, 3.0)
+OTP_VERIFY_PHONE_LIMIT = (5, 60.0)
+
 security = HTTPBearer()
 
 class Product(BaseModel):
@@ -49,9 +364,18 @@ class Product(BaseModel):
     price_increment_percent: float = 5.0
     price_decrement_rate: float = 0.5
     last_purchase_time: Optional[datetime] = None
+    # When current_price was last written (purchase, crash sale or reset);
+    # decay is measured from here.
+    price_set_at: Optional[datetime] = None
     crash_sale_active: bool = False
     purchase_count: int = 0
     price_history: List[dict] = Field(default_factory=list)
+    # Bumped by admin edits only, which compare-and-set against it; purchases
+    # and crash sales leave it alone so they never make an edit conflict.
+    version: int = 0
+    # Bumped by every write of current_price; the purchase fold compare-and-sets
+    # against it.
+    price_version: int = 0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class ProductCreate(BaseModel):
@@ -71,6 +395,9 @@ class ProductUpdate(BaseModel):
     base_price: Optional[float] = None
     max_retail_price: Optional[float] = None
     price_increment_percent: Optional[float] = None
+    # The `version` the admin edited; not If-Match, since the product ETag
+    # hashes the decayed price rather than naming a version.
+    expected_version: Optional[int] = None
 
 class Admin(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -95,8 +422,6 @@ class User(BaseModel):
     phone_number: str
     email: Optional[str] = None
     name: Optional[str] = None
-    otp: Optional[str] = None
-    otp_expiry: Optional[datetime] = None
     verified: bool = False
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -119,10 +444,16 @@ class Order(BaseModel):
     payment_status: str = "pending"
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class OrderItem(BaseModel):
+    # Clients may still send name/price; only id and quantity are trusted.
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    quantity: int = Field(1, ge=1, le=ORDER_MAX_QUANTITY)
+
 class CreateOrderRequest(BaseModel):
     user_id: str
     email: EmailStr
-    products: List[dict]
+    products: List[OrderItem] = Field(min_length=1, max_length=ORDER_MAX_ITEMS)
 
 class VerifyPaymentRequest(BaseModel):
     order_id: str
@@ -130,10 +461,339 @@ class VerifyPaymentRequest(BaseModel):
     razorpay_payment_id: str
     razorpay_signature: str
 
-def create_jwt_token(admin_id: str, email: str) -> str:
+class PasswordHasher:
+    # bcrypt costs ~250ms of CPU per call at the default work factor, so it runs
+    # on a small dedicated pool instead of the event loop. Requests beyond
+    # PASSWORD_HASH_MAX_QUEUE waiting calls are rejected rather than queued.
+    def __init__(self, rounds: int, workers: int, max_queue: int):
+        self._context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._workers = workers
+        self._max_queue = max_queue
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self._workers + self._max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Authentication is busy, please retry")
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(self._context.verify, password, password_hash)
+
+    async def verify_and_update(self, password: str, password_hash: str):
+        # Returns (valid, new_hash); new_hash is set when the stored hash uses
+        # a different work factor than BCRYPT_ROUNDS.
+        return await self._run(self._context.verify_and_update, password, password_hash)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self._workers,
+            "active": min(self._in_flight, self._workers),
+            "queued": max(self._in_flight - self._workers, 0),
+            "max_queue": self._max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = None
+
+class AdminPrincipalCache:
+    # Admin principals (no password hash) keyed by admin id. Entries expire after
+    # ADMIN_CACHE_TTL_SECONDS, which also bounds staleness across workers.
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._entries = {}
+
+    def get(self, admin_id: str) -> Optional[dict]:
+        entry = self._entries.get(admin_id)
+        if entry is None:
+            return None
+        expires_at, admin = entry
+        if expires_at < time.monotonic():
+            del self._entries[admin_id]
+            return None
+        return admin
+
+    def put(self, admin: dict):
+        self._entries[admin['id']] = (time.monotonic() + self._ttl, admin)
+
+    def invalidate(self, admin_id: str):
+        self._entries.pop(admin_id, None)
+
+admin_cache = None
+
+class MemoryOTPStore:
+    # Per-process OTP codes and rate-limit buckets. Expired codes are dropped on
+    # read and by a periodic sweep; a bucket that has refilled completely is
+    # indistinguishable from a missing one, so those are swept too.
+    SWEEP_SECONDS = 60
+
+    def __init__(self):
+        self._codes = {}
+        self._buckets = {}
+        self._next_sweep = time.monotonic() + self.SWEEP_SECONDS
+
+    def _sweep(self, now: float):
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.SWEEP_SECONDS
+        self._codes = {k: v for k, v in self._codes.items() if v[1] > now}
+        self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+
+    async def put_code(self, phone_number: str, code: str, ttl: int):
+        now = time.monotonic()
+        self._sweep(now)
+        self._codes[phone_number] = (code, now + ttl)
+
+    async def get_code(self, phone_number: str) -> Optional[str]:
+        entry = self._codes.get(phone_number)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self._codes.pop(phone_number, None)
+            return None
+        return entry[0]
+
+    async def delete_code(self, phone_number: str):
+        self._codes.pop(phone_number, None)
+
+    async def take_token(self, key: str, burst: int, refill_seconds: float) -> float:
+        # Returns 0 when a token was taken, otherwise the seconds until one is available.
+        now = time.monotonic()
+        self._sweep(now)
+        tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+        tokens = min(burst, tokens + (now - updated) / refill_seconds)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) * refill_seconds
+        self._buckets[key] = (tokens, now, now + (burst - tokens) * refill_seconds)
+        return wait
+
+    async def aclose(self):
+        pass
+
+class RedisOTPStore:
+    # Shares codes and buckets across workers. Codes use native key expiry; the
+    # token bucket runs as a script so concurrent takes cannot overdraw it.
+    TOKEN_BUCKET = """
+    local burst = tonumber(ARGV[1])
+    local refill = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(now - updated, 0) / refill)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) * refill end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) * refill * 1000) + 1000)
+    return tostring(wait)
+    """
+
+    def __init__(self, redis, prefix: str = "brandit"):
+        self._redis = redis
+        self._prefix = prefix
+        self._take = self._redis.register_script(self.TOKEN_BUCKET)
+
+    async def put_code(self, phone_number: str, code: str, ttl: int):
+        await self._redis.set(f"{self._prefix}:otp:{phone_number}", code, ex=ttl)
+
+    async def get_code(self, phone_number: str) -> Optional[str]:
+        return await self._redis.get(f"{self._prefix}:otp:{phone_number}")
+
+    async def delete_code(self, phone_number: str):
+        await self._redis.delete(f"{self._prefix}:otp:{phone_number}")
+
+    async def take_token(self, key: str, burst: int, refill_seconds: float) -> float:
+        wait = await self._take(keys=[f"{self._prefix}:rl:{key}"], args=[burst, refill_seconds, time.time()])
+        return float(wait)
+
+    async def aclose(self):
+        await self._redis.aclose()
+
+def make_otp_store():
+    if OTP_STORE_URL:
+        if aioredis is None:
+            raise RuntimeError("OTP_STORE_URL is set but the 'redis' package is not installed")
+        return RedisOTPStore(aioredis.from_url(OTP_STORE_URL, decode_responses=True))
+    logger.warning("OTP_STORE_URL is not set: OTP codes and rate limits are kept in this process. "
+                   "Set it when running more than one worker.")
+    return MemoryOTPStore()
+
+otp_store = None
+
+async def enforce_rate_limit(key: str, limit: tuple):
+    wait = await otp_store.take_token(key, *limit)
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, please retry later",
+            headers={"Retry-After": str(int(wait) + 1)}
+        )
+
+class PaymentGatewayError(Exception):
+    pass
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive failures and fails fast until
+    # `reset_after` seconds pass; a single call is then let through as a probe
+    # while the rest keep failing fast.
+    def __init__(self, threshold: int, reset_after: float):
+        self._threshold = threshold
+        self._reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._probe_until = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._reset_after:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state != "half_open":
+            return state == "closed"
+        # A probe that never reports back (e.g. a rejected request) frees the
+        # slot after another reset_after.
+        now = time.monotonic()
+        if self._probe_until is not None and now < self._probe_until:
+            return False
+        self._probe_until = now + self._reset_after
+        return True
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probe_until = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._failures >= self._threshold:
+            self._opened_at = time.monotonic()
+            self._probe_until = None
+
+class RazorpayGateway:
+    # Talks to the Razorpay REST API over a pooled keep-alive connection, so
+    # checkout never blocks the event loop on a gateway round trip.
+    BASE_URL = "https://api.razorpay.com/v1"
+    # Creating an order is not idempotent: only errors raised before the request
+    # reached the gateway are safe to retry. A read timeout may have created an
+    # order we never heard about, and a retry would create another. Likewise
+    # only 429 and 503 say the request was turned away unprocessed; any other
+    # 5xx may have come after the order was created.
+    RETRYABLE_STATUS = {429, 503}
+    RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+    def __init__(self, key_id: str, key_secret: str, timeout: float, max_retries: int,
+                 pool_size: int, breaker: CircuitBreaker):
+        self.key_id = key_id
+        self._key_secret = key_secret
+        self._max_retries = max_retries
+        self.breaker = breaker
+        self._client = httpx.AsyncClient(
+            base_url=self.BASE_URL,
+            auth=(key_id, key_secret),
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 2.0)),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    async def create_order(self, amount: int, currency: str, receipt: str) -> str:
+        if not self.breaker.allow():
+            raise PaymentGatewayError("circuit open")
+        payload = {"amount": amount, "currency": currency, "receipt": receipt, "payment_capture": 1}
+        for attempt in range(self._max_retries + 1):
+            try:
+                response = await self._client.post("/orders", json=payload)
+                if response.status_code in self.RETRYABLE_STATUS:
+                    error = PaymentGatewayError(f"gateway returned {response.status_code}")
+                elif response.status_code >= 500:
+                    self.breaker.record_failure()
+                    raise PaymentGatewayError(f"gateway failed: {response.status_code}")
+                else:
+                    response.raise_for_status()
+                    self.breaker.record_success()
+                    return response.json()['id']
+            except httpx.HTTPStatusError as e:
+                # 4xx other than 429 is our request's fault; retrying won't help
+                # and it says nothing about the gateway's health.
+                raise PaymentGatewayError(f"gateway rejected order: {e.response.status_code}") from e
+            except self.RETRYABLE_ERRORS as e:
+                error = PaymentGatewayError(f"gateway unreachable: {e!r}")
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                raise PaymentGatewayError(f"gateway call failed: {e!r}") from e
+            if attempt < self._max_retries:
+                await asyncio.sleep(random.uniform(0, 0.2 * 2 ** attempt))
+        self.breaker.record_failure()
+        raise error
+
+    def verify_signature(self, order_id: str, payment_id: str, signature: str) -> bool:
+        expected = hmac.new(
+            self._key_secret.encode(),
+            f"{order_id}|{payment_id}".encode(),
+            hashlib.sha256
+        ).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+class FakePaymentGateway:
+    # Offline stand-in used when no Razorpay key is configured (or with
+    # PAYMENT_GATEWAY=fake). FAKE_GATEWAY_LATENCY_MS simulates the network
+    # round trip for load tests.
+    key_id = ""
+
+    def __init__(self, latency_ms: float = 0):
+        self._latency = latency_ms / 1000
+        self.breaker = CircuitBreaker(PAYMENT_BREAKER_THRESHOLD, PAYMENT_BREAKER_RESET_SECONDS)
+
+    async def create_order(self, amount: int, currency: str, receipt: str) -> str:
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return f"order_{uuid.uuid4().hex[:12]}"
+
+    def verify_signature(self, order_id: str, payment_id: str, signature: str) -> bool:
+        return True
+
+    async def aclose(self):
+        pass
+
+def make_payment_gateway():
+    if PAYMENT_GATEWAY == "razorpay":
+        return RazorpayGateway(
+            razorpay_key_id, razorpay_key_secret, PAYMENT_TIMEOUT_SECONDS, PAYMENT_MAX_RETRIES,
+            PAYMENT_POOL_SIZE, CircuitBreaker(PAYMENT_BREAKER_THRESHOLD, PAYMENT_BREAKER_RESET_SECONDS)
+        )
+    return FakePaymentGateway(FAKE_GATEWAY_LATENCY_MS)
+
+payment_gateway = None
+
+def create_jwt_token(admin_id: str, email: str, name: str) -> str:
     payload = {
         'admin_id': admin_id,
         'email': email,
+        'name': name,
         'exp': datetime.now(timezone.utc) + timedelta(days=7)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
@@ -144,66 +804,639 @@ async def verify_admin_token(credentials: HTTPAuthorizationCredentials = Depends
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         admin_id = payload.get('admin_id')
         
-        admin = await db.admins.find_one({'id': admin_id}, {'_id': 0})
+        if ADMIN_AUTH_STATELESS and payload.get('name'):
+            return {"id": admin_id, "email": payload.get('email'), "name": payload['name']}
+        
+        admin = admin_cache.get(admin_id)
+        if admin:
+            return admin
+        
+        admin = await db.admins.find_one({'id': admin_id}, {'_id': 0, 'password_hash': 0})
         if not admin:
             raise HTTPException(status_code=401, detail="Invalid token")
         
+        admin_cache.put(admin)
         return admin
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-async def update_product_price(product_id: str, purchased: bool = False):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not product:
+def parse_fields(fields: Optional[str], allowed) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(requested) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id", *requested]))
+
+def stream_json_list(cursor, transform=None) -> StreamingResponse:
+    # Writes the JSON array as documents arrive so memory stays flat for any page
+    # size. Clients page with ?after=<id of the last item>.
+    async def body():
+        yield b"["
+        first = True
+        async for doc in cursor:
+            if transform:
+                doc = transform(doc)
+            yield (b"" if first else b",") + orjson.dumps(doc)
+            first = False
+        yield b"]"
+    return StreamingResponse(body(), media_type="application/json")
+
+def etag_response(request: Request, body: bytes, etag: Optional[str] = None) -> Response:
+    etag = etag or f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def serialize_product(product: dict) -> dict:
+    product.pop('_id', None)
+    product.pop('applied_events', None)
+    if isinstance(product.get('created_at'), str):
+        product['created_at'] = datetime.fromisoformat(product['created_at'])
+    for field in ('last_purchase_time', 'price_set_at'):
+        if product.get(field) and isinstance(product[field], str):
+            product[field] = datetime.fromisoformat(product[field])
+    return product
+
+def price_tick(product: dict) -> dict:
+    history = product.get('price_history') or []
+    # A base price reset clears the history.
+    event = history[-1]['event'] if history else "price_reset"
+    set_at = price_anchor(product)
+    return {
+        "type": "crash_sale" if event in ("crash_sale", "manual_crash_sale", "crash_sale_ended") else "price",
+        "product_id": product['id'],
+        "price": product['current_price'],
+        "crash_sale_active": product.get('crash_sale_active', False),
+        "purchase_count": product.get('purchase_count', 0),
+        "event": event,
+        "timestamp": set_at.isoformat() if set_at else None
+    }
+
+class ProductCatalogCache:
+    # Serialized products keyed by Mongo _id (delete events only carry _id).
+    # A change stream keeps entries current; standalone mongod has no change
+    # streams, so the cache falls back to reloading every CATALOG_POLL_INTERVAL.
+    #
+    # Every worker sees every product write here, so this is also where price
+    # ticks are published to the worker's SSE clients: once per new
+    # price_version, whether the write was made locally (put() right after it)
+    # or by another worker (the change stream or the next reload).
+    def __init__(self):
+        self._products = {}
+        self._oids = {}
+        self._price_versions = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._rendered = None
+        self.version = 0
+
+    async def load(self):
+        # From the primary: a lagging secondary could miss writes the change
+        # stream has already moved past, leaving them stale until the next change.
+        products = {}
+        oids = {}
+        async for product in db.products.find({}):
+            oid = product['_id']
+            oids[product['id']] = oid
+            products[oid] = serialize_product(product)
+            if oid in self._price_versions:
+                self._publish_if_changed(oid, products[oid])
+            else:
+                self._price_versions[oid] = products[oid].get('price_version', 0)
+        self._price_versions = {oid: v for oid, v in self._price_versions.items() if oid in products}
+        self._products = products
+        self._oids = oids
+        self._loaded = True
+        self.version += 1
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self.load()
+
+    async def render(self, now: datetime):
+        # The encoded catalog only changes with the cache version or while a
+        # product is inside its decay window, so it is reused until either happens.
+        await self._ensure_loaded()
+        if self._rendered:
+            version, valid_until, etag, body = self._rendered
+            if version == self.version and now < valid_until:
+                return etag, body
+        version = self.version
+        products = list(self._products.values())
+        body = orjson.dumps([with_decay(product, now) for product in products])
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        self._rendered = (version, decay_stable_until(products, now), etag, body)
+        return etag, body
+
+    async def get(self, product_id: str) -> Optional[dict]:
+        await self._ensure_loaded()
+        oid = self._oids.get(product_id)
+        if oid is not None:
+            return self._products[oid]
+        product = await db.products.find_one({"id": product_id})
+        return self.put(product) if product else None
+
+    def put(self, product: dict) -> dict:
+        oid = product['_id']
+        self._oids[product['id']] = oid
+        self._products[oid] = serialize_product(product)
+        self.version += 1
+        self._publish_if_changed(oid, self._products[oid])
+        return self._products[oid]
+
+    def _publish_if_changed(self, oid, product: dict):
+        # The writer's own put() and the change event that follows carry the
+        # same price_version, so each price change is published once; an older
+        # event arriving late is not published at all.
+        price_version = product.get('price_version', 0)
+        if price_version > self._price_versions.get(oid, 0):
+            self._price_versions[oid] = price_version
+            price_ticker.publish(product['id'], price_tick(product))
+
+    def evict(self, oid):
+        self._price_versions.pop(oid, None)
+        product = self._products.pop(oid, None)
+        if product:
+            self._oids.pop(product['id'], None)
+            self.version += 1
+
+    def discard(self, product_id: str):
+        oid = self._oids.get(product_id)
+        if oid is not None:
+            self.evict(oid)
+
+    def invalidate(self):
+        self._loaded = False
+        self.version += 1
+
+    def start(self):
+        self._task = start_background_task(self._watch(), "Product catalog watcher")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await finish_background_task(self._task)
+
+    async def _watch(self):
+        track_background_task("catalog_cache")
+        failures = 0
+        while True:
+            try:
+                async with db.products.watch(full_document="updateLookup") as stream:
+                    # Events may have been missed while (re)connecting.
+                    self.invalidate()
+                    async for change in stream:
+                        self._apply(change)
+                        failures = 0
+            except OperationFailure as e:
+                if e.code == 40573:
+                    logger.info("Change streams unavailable, polling product catalog every %ss", CATALOG_POLL_INTERVAL)
+                    await self._poll()
+                    return
+                failures += 1
+                logger.warning("Product change stream failed: %s", e)
+            except PyMongoError as e:
+                failures += 1
+                logger.warning("Product change stream interrupted: %s", e)
+            except Exception:
+                # E.g. a document _apply cannot serialize. Whatever it was, the
+                # cache must not keep serving entries nobody updates any more.
+                failures += 1
+                logger.exception("Product change stream handling failed")
+            self.invalidate()
+            if failures >= CATALOG_WATCH_MAX_FAILURES:
+                # Missing privileges, lost history and the like rarely fix
+                # themselves; reloading periodically keeps the cache current.
+                logger.error("Product change stream failed %d times in a row, polling the catalog every %ss instead",
+                             failures, CATALOG_POLL_INTERVAL)
+                await self._poll()
+                return
+            await asyncio.sleep(min(2 ** (failures - 1), CATALOG_POLL_INTERVAL))
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(CATALOG_POLL_INTERVAL)
+            try:
+                await self.load()
+            except PyMongoError as e:
+                logger.warning("Product catalog refresh failed: %s", e)
+            except Exception:
+                logger.exception("Product catalog refresh failed")
+
+    def _apply(self, change: dict):
+        operation = change['operationType']
+        if operation in ("insert", "update", "replace"):
+            if change.get('fullDocument'):
+                self.put(change['fullDocument'])
+            else:
+                self.evict(change['documentKey']['_id'])
+        elif operation == "delete":
+            self.evict(change['documentKey']['_id'])
+        else:
+            self.invalidate()
+
+catalog_cache = None
+
+def price_anchor(product: dict) -> Optional[datetime]:
+    # Products written before price_set_at existed were last priced by a purchase.
+    return product.get('price_set_at') or product.get('last_purchase_time')
+
+def decayed_price(price: float, price_set_at: Optional[datetime], decrement_rate: float,
+                  floor: float, now: datetime) -> float:
+    # Prices hold for an hour after they were set, then fall linearly towards the floor.
+    if price_set_at is None:
+        return price
+    hours_idle = (now - price_set_at).total_seconds() / 3600
+    if hours_idle <= 1:
+        return price
+    return min(price, max(price - decrement_rate * (hours_idle - 1), floor))
+
+def with_decay(product: dict, now: datetime) -> dict:
+    price = decayed_price(
+        product['current_price'],
+        price_anchor(product),
+        product.get('price_decrement_rate', 0.5),
+        product['base_price'] * 0.5,
+        now
+    )
+    if price == product['current_price']:
+        return product
+    return {**product, "current_price": price}
+
+def decay_stages(now: datetime) -> List[dict]:
+    # Pipeline equivalent of decayed_price(); leaves a _price_set_at helper field.
+    hours_idle = {"$divide": [{"$subtract": [now, "$_price_set_at"]}, 3600000]}
+    decayed = {"$min": [
+        "$current_price",
+        {"$max": [
+            {"$subtract": [
+                "$current_price",
+                {"$multiply": [{"$ifNull": ["$price_decrement_rate", 0.5]}, {"$subtract": [hours_idle, 1]}]}
+            ]},
+            {"$multiply": ["$base_price", 0.5]}
+        ]}
+    ]}
+    return [
+        # Older documents have no price_set_at and store last_purchase_time as
+        # an ISO string.
+        {"$set": {"_price_set_at": {"$convert": {
+            "input": {"$ifNull": ["$price_set_at", "$last_purchase_time"]},
+            "to": "date", "onError": None, "onNull": None
+        }}}},
+        {"$set": {"current_price": {"$cond": [
+            {"$and": ["$_price_set_at", {"$gt": [hours_idle, 1]}]},
+            decayed,
+            "$current_price"
+        ]}}}
+    ]
+
+def decay_stable_until(products, now: datetime) -> datetime:
+    # Earliest moment at which some product's decayed price stops being what it
+    # is at `now`; while any product is mid-decay that is one second away.
+    until = now + CATALOG_RENDER_MAX_AGE
+    for product in products:
+        price_set_at = price_anchor(product)
+        rate = product.get('price_decrement_rate', 0.5)
+        floor = product['base_price'] * 0.5
+        if price_set_at is None or rate <= 0 or product['current_price'] <= floor:
+            continue
+        starts = price_set_at + timedelta(hours=1)
+        ends = starts + timedelta(hours=(product['current_price'] - floor) / rate)
+        if now < starts:
+            until = min(until, starts)
+        elif now < ends:
+            return now + timedelta(seconds=1)
+    return until
+
+def purchase_pipeline(now: datetime, event_id: Optional[str] = None) -> List[dict]:
+    # Each stage sees the output of the previous one: the stored price is first
+    # decayed, then incremented, then crash-checked, and the history entry gets
+    # the final values.
+    timestamp = now.isoformat()
+    next_price = {"$multiply": [
+        "$current_price",
+        {"$add": [1, {"$divide": ["$price_increment_percent", 100]}]}
+    ]}
+    crashed = {"$gte": ["$_next_price", "$max_retail_price"]}
+    return [
+        *decay_stages(now),
+        {"$set": {"_next_price": next_price}},
+        {"$set": {
+            "crash_sale_active": {"$or": ["$crash_sale_active", crashed]},
+            "current_price": {"$cond": [
+                crashed,
+                {"$multiply": ["$max_retail_price", 0.5]},
+                "$_next_price"
+            ]},
+            "purchase_count": {"$add": [{"$ifNull": ["$purchase_count", 0]}, 1]},
+            "last_purchase_time": now,
+            "price_set_at": now,
+            "price_version": {"$add": [{"$ifNull": ["$price_version", 0]}, 1]}
+        }},
+        {"$set": {"price_history": {"$slice": [
+            {"$concatArrays": [
+                {"$ifNull": ["$price_history", []]},
+                [{
+                    "price": "$current_price",
+                    "timestamp": timestamp,
+                    "event": {"$cond": ["$crash_sale_active", "crash_sale", "purchase"]}
+                }]
+            ]},
+            -PRICE_HISTORY_WINDOW
+        ]}}},
+        {"$set": {"applied_events": {"$slice": [
+            {"$concatArrays": [{"$ifNull": ["$applied_events", []]}, [event_id] if event_id else []]},
+            -APPLIED_EVENTS_WINDOW
+        ]}}},
+        {"$unset": ["_next_price", "_price_set_at"]}
+    ]
+
+def history_push(price: float, event: str, now: datetime) -> dict:
+    return {"price_history": {
+        "$each": [{"price": price, "timestamp": now.isoformat(), "event": event}],
+        "$slice": -PRICE_HISTORY_WINDOW
+    }}
+
+def fold_purchases(product: dict, count: int, now: datetime) -> Tuple[dict, List[dict]]:
+    # `count` purchases at `now`, priced exactly as that many purchase_pipeline
+    # runs would: decay once, then increment and crash-check each purchase.
+    price = decayed_price(
+        product['current_price'],
+        price_anchor(product),
+        product.get('price_decrement_rate', 0.5),
+        product['base_price'] * 0.5,
+        now
+    )
+    crash_sale_active = product.get('crash_sale_active', False)
+    history = []
+    for _ in range(count):
+        price = price * (1 + product['price_increment_percent'] / 100)
+        if price >= product['max_retail_price']:
+            crash_sale_active = True
+            price = product['max_retail_price'] * 0.5
+        history.append({
+            "price": price,
+            "timestamp": now.isoformat(),
+            "event": "crash_sale" if crash_sale_active else "purchase"
+        })
+    fields = {
+        "current_price": price,
+        "crash_sale_active": crash_sale_active,
+        "purchase_count": product.get('purchase_count', 0) + count,
+        "last_purchase_time": now,
+        "price_set_at": now
+    }
+    return fields, history
+
+class PriceTickerHub:
+    # Fans price events out to per-product topics; "*" receives every product.
+    # Each subscriber gets a bounded queue and a slow consumer loses its oldest
+    # ticks instead of holding up the writer or growing without limit.
+    def __init__(self):
+        self._topics = {}
+
+    def subscribe(self, topics: List[str]) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=TICKER_QUEUE_SIZE)
+        for topic in topics:
+            self._topics.setdefault(topic, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, topics: List[str]):
+        for topic in topics:
+            subscribers = self._topics.get(topic)
+            if subscribers:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, product_id: str, message: dict):
+        subscribers = self._topics.get(product_id, set()) | self._topics.get("*", set())
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def close(self):
+        # Ends every open stream (a None message) so shutdown need not wait for clients.
+        for queue in {queue for subscribers in self._topics.values() for queue in subscribers}:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        self._topics.clear()
+
+price_ticker = None
+market_stats_stale = None
+
+def hour_key(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H")
+
+async def emit_price_events(products: List[dict], event: str, now: datetime):
+    if not products:
         return
+    await db.price_ticks.insert_many([
+        {"product_id": product['id'], "timestamp": now, "price": product['current_price'], "event": event}
+        for product in products
+    ], ordered=False)
+    if event in PURCHASE_EVENTS:
+        await db.market_stats.update_one(
+            {"_id": "global"},
+            {"$inc": {"total_volume": len(products), f"volume_by_hour.{hour_key(now)}": len(products)}},
+            upsert=True
+        )
+    else:
+        market_stats_stale.set()
+
+async def emit_price_event(product: dict, event: str, now: datetime):
+    await emit_price_events([product], event, now)
+
+async def update_product_price(product_id: str, event_id: Optional[str] = None):
+    now = datetime.now(timezone.utc)
+    query = {"id": product_id}
+    if event_id:
+        query["applied_events"] = {"$ne": event_id}
+    product = await db.products.find_one_and_update(
+        query,
+        purchase_pipeline(now, event_id),
+        return_document=ReturnDocument.AFTER
+    )
+    if product:
+        catalog_cache.put(product)
+        await emit_price_event(product, product['price_history'][-1]['event'], now)
+    return product
+
+async def apply_purchases(product_id: str, event_ids: List[str]):
+    # Folds a batch of outbox events into a single write, so a product selling
+    # many times a second costs one document update per batch instead of one
+    # per purchase. The write is a compare-and-set on price_version, and events
+    # already in applied_events are skipped, so a crash threshold crossed by the
+    # batch fires once even if the batch is retried.
+    for _ in range(PURCHASE_FOLD_ATTEMPTS):
+        product = await db.products.find_one({"id": product_id}, {"_id": 0})
+        if not product:
+            return None
+        applied = set(product.get('applied_events', []))
+        pending = [event_id for event_id in event_ids if event_id not in applied]
+        if not pending:
+            return product
+        
+        now = datetime.now(timezone.utc)
+        # Older documents store last_purchase_time as an ISO string.
+        fields, history = fold_purchases(serialize_product(product), len(pending), now)
+        price_version = product.get('price_version', 0)
+        fields["price_version"] = price_version + 1
+        updated = await db.products.find_one_and_update(
+            {"id": product_id, "price_version": {"$in": [0, None]} if price_version == 0 else price_version},
+            {
+                "$set": fields,
+                "$push": {
+                    "price_history": {"$each": history, "$slice": -PRICE_HISTORY_WINDOW},
+                    "applied_events": {"$each": pending, "$slice": -APPLIED_EVENTS_WINDOW}
+                }
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if updated:
+            catalog_cache.put(updated)
+            for event in PURCHASE_EVENTS:
+                ticks = [{**updated, "current_price": entry['price']} for entry in history if entry['event'] == event]
+                await emit_price_events(ticks, event, now)
+            return updated
     
-    if purchased:
-        new_price = product['current_price'] * (1 + product['price_increment_percent'] / 100)
-        if new_price >= product['max_retail_price']:
-            product['crash_sale_active'] = True
-            new_price = product['max_retail_price'] * 0.5
-            product['current_price'] = new_price
-        else:
-            product['current_price'] = new_price
+    # Still losing the race to other writers: the per-event pipeline needs no
+    # read, so it always makes progress.
+    logger.info("Purchase fold for %s kept conflicting, applying events one by one", product_id)
+    for event_id in event_ids:
+        product = await update_product_price(product_id, event_id)
+    return product
+
+class PriceOutboxConsumer:
+    # Drains price_outbox, the durable record of purchases whose price update is
+    # still owed. Workers claim batches with a lease, so several processes can
+    # drain concurrently and a crashed worker's batch is retried once its lease
+    # lapses; event ids make a retried purchase a no-op on the product.
+    def __init__(self):
+        self.owner = uuid.uuid4().hex
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+
+    def notify(self):
+        self._wakeup.set()
+
+    def start(self):
+        self._stopping = False
+        self._task = start_background_task(self._run(), "Price outbox consumer")
+
+    async def stop(self, grace: float = 0):
+        # The batch in hand may finish within `grace` seconds instead of being
+        # left leased until OUTBOX_LEASE_SECONDS lapse; unclaimed events simply
+        # wait in the outbox for the next worker.
+        if self._task:
+            self._stopping = True
+            self._wakeup.set()
+            done, _ = await asyncio.wait({self._task}, timeout=grace)
+            if not done:
+                self._task.cancel()
+            await finish_background_task(self._task)
+
+    async def _run(self):
+        track_background_task("price_outbox")
+        while not self._stopping:
+            try:
+                claimed = await self.drain_batch()
+            except PyMongoError as e:
+                logger.warning("Price outbox drain failed: %s", e)
+                claimed = 0
+            except Exception:
+                # Whatever broke, claimed events stay leased and are retried
+                # later; stopping here would leave the outbox undrained.
+                logger.exception("Price outbox drain failed")
+                claimed = 0
+            if claimed < OUTBOX_BATCH_SIZE and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    if not self._stopping:
+                        await asyncio.sleep(OUTBOX_COALESCE_SECONDS)
+                self._wakeup.clear()
+
+    async def drain_batch(self) -> int:
+        now = datetime.now(timezone.utc)
+        claimable = {"$or": [
+            {"status": "pending"},
+            {"status": "processing", "lease_until": {"$lt": now}}
+        ]}
+        candidates = await db.price_outbox.find(claimable, {"_id": 1}) \
+            .sort("created_at", ASCENDING).limit(OUTBOX_BATCH_SIZE).to_list(None)
+        if not candidates:
+            return 0
         
-        product['purchase_count'] = product['purchase_count'] + 1
-        product['last_purchase_time'] = datetime.now(timezone.utc).isoformat()
+        ids = [event['_id'] for event in candidates]
+        await db.price_outbox.update_many(
+            {"_id": {"$in": ids}, **claimable},
+            {
+                "$set": {
+                    "status": "processing",
+                    "lease_owner": self.owner,
+                    "lease_until": now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+                },
+                "$inc": {"attempts": 1}
+            }
+        )
+        events = await db.price_outbox.find(
+            {"_id": {"$in": ids}, "status": "processing", "lease_owner": self.owner}
+        ).sort("created_at", ASCENDING).to_list(None)
         
-        product['price_history'].append({
-            "price": new_price,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "event": "crash_sale" if product['crash_sale_active'] else "purchase"
-        })
+        # Each product's purchases are folded into one write, in created_at
+        # order; different products are updated in parallel.
+        by_product = {}
+        for event in events:
+            by_product.setdefault(event['product_id'], []).append(event)
         
-        await db.products.update_one(
-            {"id": product_id},
-            {"$set": product}
-        )
-    else:
-        if product.get('last_purchase_time'):
-            last_purchase = datetime.fromisoformat(product['last_purchase_time'])
-            time_since_purchase = (datetime.now(timezone.utc) - last_purchase).total_seconds() / 3600
-            
-            if time_since_purchase > 1:
-                decrement = product['price_decrement_rate'] * (time_since_purchase - 1)
-                new_price = max(
-                    product['current_price'] - decrement,
-                    product['base_price'] * 0.5
+        async def apply(product_id, product_events):
+            event_ids = [event['_id'] for event in product_events]
+            try:
+                if len(event_ids) == 1:
+                    await update_product_price(product_id, event_ids[0])
+                else:
+                    await apply_purchases(product_id, event_ids)
+                return event_ids
+            except PyMongoError as e:
+                logger.warning("Price update for %s failed, will retry: %s", product_id, e)
+                error = str(e)
+            except Exception as e:
+                logger.exception("Price update for %s failed", product_id)
+                error = repr(e)
+            # An event that fails on every claim would otherwise be retried
+            # forever; park it where an operator can inspect and requeue it.
+            exhausted = [event['_id'] for event in product_events if event.get('attempts', 0) >= OUTBOX_MAX_ATTEMPTS]
+            if exhausted:
+                logger.error("Giving up on %d price update(s) for %s after %d attempts",
+                             len(exhausted), product_id, OUTBOX_MAX_ATTEMPTS)
+                await db.price_outbox.update_many(
+                    {"_id": {"$in": exhausted}, "lease_owner": self.owner},
+                    {"$set": {"status": "failed", "error": error, "failed_at": now}}
                 )
-                
-                if new_price != product['current_price']:
-                    product['current_price'] = new_price
-                    product['price_history'].append({
-                        "price": new_price,
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        "event": "decay"
-                    })
-                    await db.products.update_one(
-                        {"id": product_id},
-                        {"$set": product}
-                    )
+            return []
+        
+        results = await asyncio.gather(*(apply(pid, events) for pid, events in by_product.items()))
+        done = [event_id for batch in results for event_id in batch]
+        if done:
+            await db.price_outbox.delete_many({"_id": {"$in": done}, "lease_owner": self.owner})
+        return len(ids)
+
+price_outbox = None
 
 @api_router.get("/")
 async def root():
@@ -215,7 +1448,7 @@ async def register_admin(admin_input: AdminCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Admin already exists")
     
-    password_hash = bcrypt.hash(admin_input.password)
+    password_hash = await password_hasher.hash(admin_input.password)
     admin = Admin(
         email=admin_input.email,
         password_hash=password_hash,
@@ -226,7 +1459,7 @@ async def register_admin(admin_input: AdminCreate):
     doc['created_at'] = doc['created_at'].isoformat()
     await db.admins.insert_one(doc)
     
-    token = create_jwt_token(admin.id, admin.email)
+    token = create_jwt_token(admin.id, admin.email, admin.name)
     return {"message": "Admin created", "token": token, "admin": {"id": admin.id, "email": admin.email, "name": admin.name}}
 
 @api_router.post("/admin/login")
@@ -235,10 +1468,14 @@ async def login_admin(login_data: AdminLogin):
     if not admin:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not bcrypt.verify(login_data.password, admin['password_hash']):
+    valid, new_hash = await password_hasher.verify_and_update(login_data.password, admin['password_hash'])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    token = create_jwt_token(admin['id'], admin['email'])
+    if new_hash:
+        await db.admins.update_one({"id": admin['id']}, {"$set": {"password_hash": new_hash}})
+    
+    token = create_jwt_token(admin['id'], admin['email'], admin['name'])
     return {"token": token, "admin": {"id": admin['id'], "email": admin['email'], "name": admin['name']}}
 
 @api_router.get("/admin/me")
@@ -251,7 +1488,7 @@ async def create_new_admin(admin_input: AdminCreate, current_admin = Depends(ver
     if existing:
         raise HTTPException(status_code=400, detail="Admin with this email already exists")
     
-    password_hash = bcrypt.hash(admin_input.password)
+    password_hash = await password_hasher.hash(admin_input.password)
     new_admin = Admin(
         email=admin_input.email,
         password_hash=password_hash,
@@ -270,22 +1507,39 @@ class ChangePasswordRequest(BaseModel):
 
 @api_router.post("/admin/change-password")
 async def change_admin_password(request: ChangePasswordRequest, admin = Depends(verify_admin_token)):
-    if not bcrypt.verify(request.current_password, admin['password_hash']):
+    stored = await db.admins.find_one({"id": admin['id']}, {"_id": 0, "password_hash": 1})
+    if not stored:
+        raise HTTPException(status_code=404, detail="Admin not found")
+    
+    if not await password_hasher.verify(request.current_password, stored['password_hash']):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
-    new_password_hash = bcrypt.hash(request.new_password)
+    new_password_hash = await password_hasher.hash(request.new_password)
     
     await db.admins.update_one(
         {"id": admin['id']},
         {"$set": {"password_hash": new_password_hash}}
     )
+    admin_cache.invalidate(admin['id'])
     
     return {"message": "Password changed successfully"}
 
+@api_router.get("/admin/password-hasher/stats")
+async def get_password_hasher_stats(admin = Depends(verify_admin_token)):
+    return password_hasher.stats()
+
 @api_router.get("/admin/all-admins")
-async def get_all_admins(admin = Depends(verify_admin_token)):
-    admins = await db.admins.find({}, {"_id": 0, "password_hash": 0}).to_list(1000)
-    return admins
+async def get_all_admins(
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    fields: Optional[str] = None,
+    admin = Depends(verify_admin_token)
+):
+    projection = {"_id": 0, **{f: 1 for f in parse_fields(fields, ADMIN_FIELDS) or ADMIN_FIELDS}}
+    cursor = db.admins.find({"id": {"$gt": after}} if after else {}, projection).sort("id", ASCENDING)
+    if limit:
+        cursor = cursor.limit(limit)
+    return stream_json_list(cursor)
 
 @api_router.delete("/admin/delete-admin/{admin_id}")
 async def delete_admin(admin_id: str, current_admin = Depends(verify_admin_token)):
@@ -295,79 +1549,158 @@ async def delete_admin(admin_id: str, current_admin = Depends(verify_admin_token
     result = await db.admins.delete_one({"id": admin_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Admin not found")
+    admin_cache.invalidate(admin_id)
     
     return {"message": "Admin deleted successfully"}
 
 @api_router.post("/auth/send-otp")
-async def send_otp(request: SendOTPRequest):
-    otp = str(random.randint(100000, 999999))
-    otp_expiry = datetime.now(timezone.utc) + timedelta(minutes=10)
-    
-    existing_user = await db.users.find_one({"phone_number": request.phone_number}, {"_id": 0})
+async def send_otp(request: SendOTPRequest, http_request: Request):
+    client_ip = http_request.client.host if http_request.client else "unknown"
+    await enforce_rate_limit(f"send:ip:{client_ip}", OTP_SEND_IP_LIMIT)
+    await enforce_rate_limit(f"send:phone:{request.phone_number}", OTP_SEND_PHONE_LIMIT)
     
-    if existing_user:
-        await db.users.update_one(
-            {"phone_number": request.phone_number},
-            {"$set": {"otp": otp, "otp_expiry": otp_expiry.isoformat()}}
-        )
-    else:
-        user = User(
-            phone_number=request.phone_number,
-            otp=otp,
-            otp_expiry=otp_expiry
-        )
-        doc = user.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
-        if doc.get('otp_expiry'):
-            doc['otp_expiry'] = doc['otp_expiry'].isoformat()
-        await db.users.insert_one(doc)
+    otp = str(random.randint(100000, 999999))
+    await otp_store.put_code(request.phone_number, otp, OTP_TTL_SECONDS)
     
     return {"message": "OTP sent successfully", "otp": otp}
 
 @api_router.post("/auth/verify-otp")
 async def verify_otp(request: VerifyOTPRequest):
-    user = await db.users.find_one({"phone_number": request.phone_number}, {"_id": 0})
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    await enforce_rate_limit(f"verify:phone:{request.phone_number}", OTP_VERIFY_PHONE_LIMIT)
     
-    if user['otp'] != request.otp:
+    otp = await otp_store.get_code(request.phone_number)
+    if otp is None:
+        raise HTTPException(status_code=400, detail="OTP expired or not requested")
+    # Bytes, because compare_digest rejects non-ASCII str with a TypeError.
+    if not hmac.compare_digest(otp.encode(), request.otp.encode()):
         raise HTTPException(status_code=400, detail="Invalid OTP")
+    await otp_store.delete_code(request.phone_number)
     
-    otp_expiry = datetime.fromisoformat(user['otp_expiry'])
-    if datetime.now(timezone.utc) > otp_expiry:
-        raise HTTPException(status_code=400, detail="OTP expired")
-    
-    await db.users.update_one(
+    # The account is created on first successful verification, not on send.
+    new_user = User(phone_number=request.phone_number, verified=True).model_dump()
+    new_user['created_at'] = new_user['created_at'].isoformat()
+    del new_user['phone_number'], new_user['verified']
+    user = await db.users.find_one_and_update(
         {"phone_number": request.phone_number},
-        {"$set": {"verified": True, "otp": None, "otp_expiry": None}}
+        # $unset clears OTP fields left on accounts by earlier releases.
+        {"$set": {"verified": True}, "$setOnInsert": new_user, "$unset": {"otp": "", "otp_expiry": ""}},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
     
-    user['verified'] = True
     return {"message": "OTP verified successfully", "user": user}
 
 @api_router.get("/products", response_model=List[Product])
-async def get_products():
-    products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    for product in products:
-        if isinstance(product.get('created_at'), str):
-            product['created_at'] = datetime.fromisoformat(product['created_at'])
-        if product.get('last_purchase_time') and isinstance(product['last_purchase_time'], str):
-            product['last_purchase_time'] = datetime.fromisoformat(product['last_purchase_time'])
-    return products
+async def get_products(
+    request: Request,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    fields: Optional[str] = None
+):
+    now = datetime.now(timezone.utc)
+    if after is None and limit is None and fields is None:
+        etag, body = await catalog_cache.render(now)
+        return etag_response(request, body, etag)
+    
+    requested = parse_fields(fields, Product.model_fields)
+    projection = {"_id": 0}
+    if requested:
+        projection.update({f: 1 for f in requested})
+        if "current_price" in requested:
+            projection.update({f: 1 for f in ("base_price", "last_purchase_time", "price_set_at", "price_decrement_rate")})
+    
+    def transform(product):
+        product = serialize_product(product)
+        if "current_price" in product:
+            product = with_decay(product, now)
+        return {k: product[k] for k in requested if k in product} if requested else product
+    
+    cursor = read_db.products.find({"id": {"$gt": after}} if after else {}, projection).sort("id", ASCENDING)
+    if limit:
+        cursor = cursor.limit(limit)
+    return stream_json_list(cursor, transform)
 
 @api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+async def get_product(product_id: str, request: Request):
+    product = await catalog_cache.get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    return etag_response(request, orjson.dumps(with_decay(product, datetime.now(timezone.utc))))
+
+@api_router.get("/products/{product_id}/history")
+async def get_product_history(
+    product_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: str = "1h"
+):
+    if resolution not in HISTORY_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(HISTORY_RESOLUTIONS)}")
+    unit, bin_size = HISTORY_RESOLUTIONS[resolution]
     
-    if isinstance(product.get('created_at'), str):
-        product['created_at'] = datetime.fromisoformat(product['created_at'])
-    if product.get('last_purchase_time') and isinstance(product['last_purchase_time'], str):
-        product['last_purchase_time'] = datetime.fromisoformat(product['last_purchase_time'])
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
     
-    return product
+    bucket_seconds = {"minute": 60, "hour": 3600, "day": 86400}[unit] * bin_size
+    if (end - start).total_seconds() / bucket_seconds > HISTORY_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail="Range too large for this resolution")
+    
+    buckets = await read_db.price_ticks.aggregate([
+        {"$match": {"product_id": product_id, "timestamp": {"$gte": start, "$lt": end}}},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$timestamp", "unit": unit, "binSize": bin_size}},
+            "open": {"$first": "$price"},
+            "high": {"$max": "$price"},
+            "low": {"$min": "$price"},
+            "close": {"$last": "$price"},
+            "volume": {"$sum": {"$cond": [{"$in": ["$event", list(PURCHASE_EVENTS)]}, 1, 0]}}
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "timestamp": "$_id", "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}}
+    ]).to_list(HISTORY_MAX_BUCKETS)
+    
+    return {
+        "product_id": product_id,
+        "resolution": resolution,
+        "from": start,
+        "to": end,
+        "buckets": buckets
+    }
+
+@api_router.get("/stream/prices")
+async def stream_prices(product_ids: Optional[str] = None):
+    topics = [p for p in (product_ids or "").split(",") if p] or ["*"]
+    if len(topics) > TICKER_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"At most {TICKER_MAX_TOPICS} products per stream")
+    queue = price_ticker.subscribe(topics)
+    
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), TICKER_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield f"event: {message['type']}\ndata: {orjson.dumps(message).decode()}\n\n"
+        finally:
+            price_ticker.unsubscribe(queue, topics)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.post("/products", response_model=Product)
 async def create_product(product_input: ProductCreate):
@@ -377,35 +1710,63 @@ async def create_product(product_input: ProductCreate):
     )
     
     doc = product.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    if doc.get('last_purchase_time'):
-        doc['last_purchase_time'] = doc['last_purchase_time'].isoformat()
-    
     await db.products.insert_one(doc)
+    catalog_cache.put(doc)
+    market_stats_stale.set()
     return product
 
 @api_router.put("/admin/products/{product_id}", response_model=Product)
-async def update_product(product_id: str, product_update: ProductUpdate, admin = Depends(verify_admin_token)):
-    existing = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Product not found")
+async def update_product(
+    product_id: str,
+    product_update: ProductUpdate,
+    admin = Depends(verify_admin_token)
+):
+    update_data = product_update.model_dump(exclude={"expected_version"}, exclude_none=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    expected_version = product_update.expected_version
     
-    update_data = {k: v for k, v in product_update.model_dump().items() if v is not None}
+    query = {"id": product_id}
+    if expected_version is not None:
+        # Products written before versioning have no field; they count as 0.
+        query["version"] = {"$in": [0, None]} if expected_version == 0 else expected_version
     
+    # Mongo stores milliseconds; truncating lets the reset marker be compared below.
+    now = datetime.now(timezone.utc)
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    update = {k: {"$literal": v} for k, v in update_data.items()}
+    update["version"] = {"$add": [{"$ifNull": ["$version", 0]}, 1]}
     if 'base_price' in update_data:
-        update_data['current_price'] = update_data['base_price']
-        update_data['crash_sale_active'] = False
-        update_data['purchase_count'] = 0
-        update_data['price_history'] = []
-    
-    await db.products.update_one({"id": product_id}, {"$set": update_data})
+        # A pipeline update sees the stored document, so the market state is
+        # reset only when the base price really changes, and atomically with
+        # any purchase that lands around the edit.
+        changed = {"$ne": ["$base_price", update_data['base_price']]}
+        update.update({
+            "current_price": {"$cond": [changed, update_data['base_price'], "$current_price"]},
+            "crash_sale_active": {"$cond": [changed, False, "$crash_sale_active"]},
+            "purchase_count": {"$cond": [changed, 0, "$purchase_count"]},
+            "price_history": {"$cond": [changed, [], "$price_history"]},
+            "price_reset_at": {"$cond": [changed, now, "$price_reset_at"]},
+            "price_set_at": {"$cond": [changed, now, "$price_set_at"]},
+            "price_version": {"$cond": [
+                changed, {"$add": [{"$ifNull": ["$price_version", 0]}, 1]}, "$price_version"
+            ]}
+        })
     
-    updated_product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if isinstance(updated_product.get('created_at'), str):
-        updated_product['created_at'] = datetime.fromisoformat(updated_product['created_at'])
-    if updated_product.get('last_purchase_time') and isinstance(updated_product['last_purchase_time'], str):
-        updated_product['last_purchase_time'] = datetime.fromisoformat(updated_product['last_purchase_time'])
+    updated = await db.products.find_one_and_update(
+        query,
+        [{"$set": update}],
+        return_document=ReturnDocument.AFTER
+    )
+    if updated is None:
+        if expected_version is not None and await db.products.count_documents({"id": product_id}, limit=1):
+            raise HTTPException(status_code=409, detail="Product was modified by someone else; reload and retry")
+        raise HTTPException(status_code=404, detail="Product not found")
     
+    updated_product = catalog_cache.put(updated)
+    market_stats_stale.set()
+    if updated.get('price_reset_at') == now:
+        await emit_price_event(updated_product, "price_reset", now)
     return updated_product
 
 @api_router.delete("/admin/products/{product_id}")
@@ -413,8 +1774,171 @@ async def delete_product(product_id: str, admin = Depends(verify_admin_token)):
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    catalog_cache.discard(product_id)
+    market_stats_stale.set()
     return {"message": "Product deleted successfully"}
 
+# Columns of the CSV export, and of a CSV import's header.
+PRODUCT_EXPORT_FIELDS = ("id", *ProductCreate.model_fields)
+
+async def request_lines(request: Request):
+    # Yields the body line by line as it arrives instead of buffering the upload.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+async def ndjson_rows(lines):
+    # Yields (line number, row, error) for each non-blank line.
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield line_number, None, f"invalid JSON: {e}"
+            continue
+        if isinstance(row, dict):
+            yield line_number, row, None
+        else:
+            yield line_number, None, "expected a JSON object"
+
+async def csv_rows(lines):
+    # Same as ndjson_rows for CSV with a header row. A quoted field may span
+    # lines, so lines are gathered until the quotes balance.
+    header = None
+    record, start, line_number = [], 0, 0
+    async for line in lines:
+        line_number += 1
+        if not record:
+            start = line_number
+        record.append(line)
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            continue
+        record = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty cells fall back to the model defaults.
+        yield start, {name: value for name, value in zip(header, values) if value != ""}, None
+    if record:
+        yield start, None, "unterminated quoted field"
+
+async def insert_product_batch(docs: List[dict]) -> Tuple[int, int]:
+    # Returns (inserted, duplicates); ids that already exist are skipped, so
+    # re-running an import is harmless.
+    try:
+        result = await db.products.insert_many(docs, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as e:
+        write_errors = e.details['writeErrors']
+        if any(error['code'] != 11000 for error in write_errors):
+            raise
+        return e.details['nInserted'], len(write_errors)
+
+@api_router.post("/admin/products/bulk")
+async def bulk_import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    admin = Depends(verify_admin_token)
+):
+    # Streams NDJSON (default) or CSV (format=csv or a text/csv body), one
+    # product per row. Rows are validated as they arrive and inserted in
+    # batches; rows that fail validation are reported and skipped. Rows with an
+    # id keep it, so an export can be imported elsewhere. A row carrying
+    # current_price is a whole product from the NDJSON export and keeps its
+    # market state; other rows are new definitions starting at base_price.
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    rows = (csv_rows if format == "csv" else ndjson_rows)(request_lines(request))
+    
+    inserted = duplicates = failed = 0
+    errors = []
+    batch = []
+    async for line_number, row, error in rows:
+        if row is not None:
+            try:
+                if "current_price" in row:
+                    product = Product.model_validate(row)
+                else:
+                    product_input = ProductCreate.model_validate(row)
+                    product = Product(
+                        **product_input.model_dump(),
+                        current_price=product_input.base_price,
+                        **({"id": str(row['id'])} if row.get('id') else {})
+                    )
+            except ValidationError as e:
+                error = "; ".join(
+                    f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in e.errors()
+                )
+        if error:
+            failed += 1
+            if len(errors) < BULK_IMPORT_MAX_ERRORS:
+                errors.append({"line": line_number, "error": error})
+            continue
+        
+        batch.append(product.model_dump())
+        if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+            added, skipped = await insert_product_batch(batch)
+            inserted, duplicates = inserted + added, duplicates + skipped
+            batch = []
+    if batch:
+        added, skipped = await insert_product_batch(batch)
+        inserted, duplicates = inserted + added, duplicates + skipped
+    
+    if inserted:
+        catalog_cache.invalidate()
+        market_stats_stale.set()
+    return {"inserted": inserted, "duplicates": duplicates, "failed": failed, "errors": errors}
+
+@api_router.get("/admin/products/export")
+async def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    admin = Depends(verify_admin_token)
+):
+    # NDJSON carries whole products, market state included, and re-imports as
+    # such; CSV carries product definitions only, which import at base_price.
+    if format == "ndjson":
+        cursor = db.products.find({}, {"_id": 0, "applied_events": 0}).sort("id", ASCENDING)
+        
+        async def body():
+            async for product in cursor:
+                yield orjson.dumps(serialize_product(product)) + b"\n"
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+    
+    cursor = db.products.find({}, {"_id": 0, **{f: 1 for f in PRODUCT_EXPORT_FIELDS}}).sort("id", ASCENDING)
+    
+    async def body():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(PRODUCT_EXPORT_FIELDS)
+        async for product in cursor:
+            writer.writerow([product.get(f, "") for f in PRODUCT_EXPORT_FIELDS])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode()
+    return StreamingResponse(
+        body(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="products.csv"'}
+    )
+
 class CrashSaleRequest(BaseModel):
     product_ids: List[str]
     activate: bool
@@ -424,143 +1948,376 @@ async def manage_crash_sale(request: CrashSaleRequest, admin = Depends(verify_ad
     if not request.product_ids:
         raise HTTPException(status_code=400, detail="No products selected")
     
-    for product_id in request.product_ids:
-        product = await db.products.find_one({"id": product_id}, {"_id": 0})
-        if not product:
-            continue
-        
-        if request.activate:
-            crash_price = product['max_retail_price'] * 0.5
-            update_data = {
-                "crash_sale_active": True,
-                "current_price": crash_price
+    product_ids = list(dict.fromkeys(request.product_ids))
+    now = datetime.now(timezone.utc)
+    event = "manual_crash_sale" if request.activate else "crash_sale_ended"
+    
+    targets = await db.products.find(
+        {"id": {"$in": product_ids}},
+        {"_id": 0, "id": 1, "max_retail_price": 1, "base_price": 1}
+    ).to_list(None)
+    
+    operations = []
+    prices = {}
+    for product in targets:
+        new_price = product['max_retail_price'] * 0.5 if request.activate else product['base_price']
+        prices[product['id']] = new_price
+        operations.append(UpdateOne(
+            {"id": product['id']},
+            {
+                "$set": {"crash_sale_active": request.activate, "current_price": new_price, "price_set_at": now},
+                "$push": history_push(new_price, event, now),
+                "$inc": {"price_version": 1}
             }
-            
-            product['price_history'].append({
-                "price": crash_price,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "event": "manual_crash_sale"
-            })
-            update_data['price_history'] = product['price_history']
+        ))
+    
+    failed = {}
+    if operations:
+        try:
+            await db.products.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details['writeErrors']:
+                failed[targets[error['index']]['id']] = error['errmsg']
+    
+    updated = [p for p in targets if p['id'] not in failed]
+    if updated:
+        refreshed = await db.products.find({"id": {"$in": [p['id'] for p in updated]}}).to_list(None)
+        await emit_price_events([catalog_cache.put(p) for p in refreshed], event, now)
+    
+    results = []
+    for product_id in product_ids:
+        if product_id in failed:
+            results.append({"product_id": product_id, "status": "failed", "error": failed[product_id]})
+        elif product_id in prices:
+            results.append({"product_id": product_id, "status": "updated", "current_price": prices[product_id]})
         else:
-            update_data = {
-                "crash_sale_active": False,
-                "current_price": product['base_price']
-            }
-            
-            product['price_history'].append({
-                "price": product['base_price'],
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "event": "crash_sale_ended"
-            })
-            update_data['price_history'] = product['price_history']
-        
-        await db.products.update_one({"id": product_id}, {"$set": update_data})
+            results.append({"product_id": product_id, "status": "not_found"})
     
     action = "activated" if request.activate else "deactivated"
-    return {"message": f"Crash sale {action} for {len(request.product_ids)} product(s)"}
+    return {
+        "message": f"Crash sale {action} for {len(updated)} product(s)",
+        "results": results
+    }
 
 @api_router.post("/orders/create")
 async def create_order(request: CreateOrderRequest):
-    total_amount = sum(item['price'] * item['quantity'] for item in request.products)
-    
-    if razorpay_client:
-        razorpay_order = razorpay_client.order.create({
-            "amount": int(total_amount * 100),
-            "currency": "INR",
-            "payment_capture": 1
+    quantities = {}
+    for item in request.products:
+        quantities[item.id] = quantities.get(item.id, 0) + item.quantity
+
+    # One round trip for the whole cart; prices come from the catalog, not the client.
+    priced = await db.products.find(
+        {"id": {"$in": list(quantities)}},
+        {"_id": 0, "id": 1, "name": 1, "current_price": 1, "base_price": 1,
+         "price_decrement_rate": 1, "last_purchase_time": 1, "price_set_at": 1}
+    ).to_list(len(quantities))
+    by_id = {p['id']: p for p in priced}
+    missing = [pid for pid in quantities if pid not in by_id]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Unknown products: {', '.join(missing)}")
+
+    now = datetime.now(timezone.utc)
+    line_items = []
+    for pid, quantity in quantities.items():
+        product = with_decay(serialize_product(by_id[pid]), now)
+        line_items.append({
+            "id": pid,
+            "name": product['name'],
+            "price": round(product['current_price'], 2),
+            "quantity": quantity
         })
-        razorpay_order_id = razorpay_order['id']
-    else:
-        razorpay_order_id = f"order_{uuid.uuid4().hex[:12]}"
-    
+    total_amount = round(sum(item['price'] * item['quantity'] for item in line_items), 2)
+
     order = Order(
         user_id=request.user_id,
         email=request.email,
-        products=request.products,
-        total_amount=total_amount,
-        razorpay_order_id=razorpay_order_id
+        products=line_items,
+        total_amount=total_amount
     )
+    try:
+        razorpay_order_id = await payment_gateway.create_order(
+            int(round(total_amount * 100)), "INR", order.id
+        )
+    except PaymentGatewayError as e:
+        logger.warning(f"Payment gateway create_order failed: {e}")
+        status_code = 503 if payment_gateway.breaker.state != "closed" else 502
+        raise HTTPException(status_code=status_code, detail="Payment gateway unavailable, please retry")
+    order.razorpay_order_id = razorpay_order_id
     
     doc = order.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.orders.insert_one(doc)
+    await record_order_created(doc)
     
     return {
         "order_id": order.id,
         "razorpay_order_id": razorpay_order_id,
         "amount": total_amount,
-        "key_id": razorpay_key_id
+        "key_id": payment_gateway.key_id
     }
 
 @api_router.post("/orders/verify-payment")
-async def verify_payment(request: VerifyPaymentRequest, background_tasks: BackgroundTasks):
+async def verify_payment(request: VerifyPaymentRequest):
     order = await db.orders.find_one({"id": request.order_id}, {"_id": 0})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    if razorpay_client:
-        signature_payload = f"{request.razorpay_order_id}|{request.razorpay_payment_id}"
-        expected_signature = hmac.new(
-            razorpay_key_secret.encode(),
-            signature_payload.encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        if expected_signature != request.razorpay_signature:
-            raise HTTPException(status_code=400, detail="Invalid payment signature")
+    if order.get('payment_status') == "completed":
+        return {"message": "Payment verified successfully", "status": "completed"}
+    
+    if not payment_gateway.verify_signature(
+        request.razorpay_order_id, request.razorpay_payment_id, request.razorpay_signature
+    ):
+        raise HTTPException(status_code=400, detail="Invalid payment signature")
+    
+    # The outbox is written before the order flips to completed: a crash in
+    # between leaves the order retryable, and the deterministic ids make the
+    # retry's inserts no-ops.
+    now = datetime.now(timezone.utc)
+    try:
+        if order['products']:
+            await db.price_outbox.insert_many([
+                {
+                    "_id": f"{order['id']}:{index}",
+                    "order_id": order['id'],
+                    "product_id": product['id'],
+                    "status": "pending",
+                    "attempts": 0,
+                    "created_at": now
+                }
+                for index, product in enumerate(order['products'])
+            ], ordered=False)
+    except BulkWriteError as e:
+        if any(error['code'] != 11000 for error in e.details['writeErrors']):
+            raise
     
-    await db.orders.update_one(
-        {"id": request.order_id},
+    result = await db.orders.update_one(
+        {"id": request.order_id, "payment_status": {"$ne": "completed"}},
         {"$set": {
             "razorpay_payment_id": request.razorpay_payment_id,
             "payment_status": "completed"
         }}
     )
-    
-    for product in order['products']:
-        background_tasks.add_task(update_product_price, product['id'], purchased=True)
+    price_outbox.notify()
+    if result.modified_count:
+        await record_order_completed(order)
     
     return {"message": "Payment verified successfully", "status": "completed"}
 
+async def rebuild_order_summary(user_id: str) -> dict:
+    # Full recomputation from orders: backfills users who ordered before the
+    # read model existed and repairs a summary that missed an update.
+    completed = {"$eq": ["$payment_status", "completed"]}
+    facets = await db.orders.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "total_orders": {"$sum": 1},
+                "completed_orders": {"$sum": {"$cond": [completed, 1, 0]}},
+                "pending_orders": {"$sum": {"$cond": [completed, 0, 1]}},
+                "lifetime_spend": {"$sum": {"$cond": [completed, "$total_amount", 0]}}
+            }}],
+            "recent_orders": [
+                {"$sort": {"created_at": -1, "id": -1}},
+                {"$limit": ORDER_SUMMARY_RECENT},
+                {"$project": {"_id": 0, **{f: 1 for f in ORDER_SUMMARY_FIELDS}}}
+            ]
+        }}
+    ]).to_list(1)
+    totals = facets[0]['totals'][0] if facets and facets[0]['totals'] else {}
+    summary = {
+        "total_orders": totals.get('total_orders', 0),
+        "completed_orders": totals.get('completed_orders', 0),
+        "pending_orders": totals.get('pending_orders', 0),
+        "lifetime_spend": totals.get('lifetime_spend', 0),
+        "recent_orders": facets[0]['recent_orders'] if facets else [],
+        "updated_at": datetime.now(timezone.utc)
+    }
+    await db.user_order_summaries.replace_one({"_id": user_id}, summary, upsert=True)
+    return summary
+
+async def record_order_created(order: dict):
+    result = await db.user_order_summaries.update_one(
+        {"_id": order['user_id']},
+        {
+            "$inc": {"total_orders": 1, "pending_orders": 1},
+            "$push": {"recent_orders": {
+                "$each": [{f: order[f] for f in ORDER_SUMMARY_FIELDS}],
+                "$position": 0,
+                "$slice": ORDER_SUMMARY_RECENT
+            }},
+            "$set": {"updated_at": datetime.now(timezone.utc)}
+        }
+    )
+    if not result.matched_count:
+        await rebuild_order_summary(order['user_id'])
+
+async def record_order_completed(order: dict):
+    # Only called by the request that flipped the order, so counts move once.
+    result = await db.user_order_summaries.update_one(
+        {"_id": order['user_id']},
+        {
+            "$inc": {"completed_orders": 1, "pending_orders": -1, "lifetime_spend": order['total_amount']},
+            "$set": {
+                "recent_orders.$[o].payment_status": "completed",
+                "updated_at": datetime.now(timezone.utc)
+            }
+        },
+        array_filters=[{"o.id": order['id']}]
+    )
+    if not result.matched_count:
+        await rebuild_order_summary(order['user_id'])
+
+@api_router.get("/orders/user/{user_id}/summary")
+async def get_user_order_summary(user_id: str):
+    summary = await db.user_order_summaries.find_one({"_id": user_id}, {"_id": 0})
+    if summary is None:
+        summary = await rebuild_order_summary(user_id)
+    recent = summary['recent_orders']
+    return {
+        "user_id": user_id,
+        "total_orders": summary['total_orders'],
+        "completed_orders": summary['completed_orders'],
+        "pending_orders": summary['pending_orders'],
+        "lifetime_spend": round(summary['lifetime_spend'], 2),
+        "recent_orders": recent,
+        # Older orders: GET /orders/user/{user_id}?after=<next_after>
+        "next_after": recent[-1]['id'] if summary['total_orders'] > len(recent) else None,
+        "updated_at": summary['updated_at']
+    }
+
 @api_router.get("/orders/user/{user_id}")
-async def get_user_orders(user_id: str):
-    orders = await db.orders.find({"user_id": user_id}, {"_id": 0}).to_list(1000)
-    for order in orders:
-        if isinstance(order.get('created_at'), str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-    return orders
+async def get_user_orders(
+    user_id: str,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    fields: Optional[str] = None
+):
+    # Newest first; the keyset is (created_at, id) so orders created in the
+    # same instant still page deterministically.
+    query = {"user_id": user_id}
+    if after:
+        anchor = await db.orders.find_one({"id": after, "user_id": user_id}, {"_id": 0, "created_at": 1})
+        if not anchor:
+            raise HTTPException(status_code=400, detail="Unknown 'after' order id")
+        query["$or"] = [
+            {"created_at": {"$lt": anchor['created_at']}},
+            {"created_at": anchor['created_at'], "id": {"$lt": after}}
+        ]
+    
+    requested = parse_fields(fields, Order.model_fields)
+    projection = {"_id": 0, **{f: 1 for f in requested or []}}
+    cursor = db.orders.find(query, projection).sort([("created_at", DESCENDING), ("id", DESCENDING)])
+    if limit:
+        cursor = cursor.limit(limit)
+    return stream_json_list(cursor)
+
+async def rollup_market_stats() -> dict:
+    now = datetime.now(timezone.utc)
+    price_change = {"$cond": [
+        {"$gt": ["$base_price", 0]},
+        {"$multiply": [{"$divide": [{"$subtract": ["$current_price", "$base_price"]}, "$base_price"]}, 100]},
+        0
+    ]}
+    # The rollup is written back to market_stats, so it aggregates the primary:
+    # a lagging secondary would overwrite fresh stats with stale ones.
+    facets = await db.products.aggregate([
+        {"$project": {
+            "_id": 0, "id": 1, "name": 1, "current_price": 1, "base_price": 1,
+            "price_decrement_rate": 1, "last_purchase_time": 1, "price_set_at": 1,
+            "crash_sale_active": 1, "purchase_count": 1
+        }},
+        *decay_stages(now),
+        {"$set": {"price_change": price_change}},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "total_products": {"$sum": 1},
+                "crash_sales_active": {"$sum": {"$cond": ["$crash_sale_active", 1, 0]}},
+                "total_volume": {"$sum": {"$ifNull": ["$purchase_count", 0]}},
+                "avg_price_change": {"$avg": "$price_change"}
+            }}],
+            "top_movers": [
+                {"$set": {"abs_change": {"$abs": "$price_change"}}},
+                {"$sort": {"abs_change": -1}},
+                {"$limit": MARKET_TOP_MOVERS},
+                {"$project": {"id": 1, "name": 1, "current_price": 1, "price_change": 1}}
+            ]
+        }}
+    ]).to_list(1)
+    hourly = await db.price_ticks.aggregate([
+        {"$match": {"timestamp": {"$gte": now - timedelta(hours=24)}, "event": {"$in": list(PURCHASE_EVENTS)}}},
+        {"$group": {"_id": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}, "count": {"$sum": 1}}}
+    ]).to_list(None)
+    
+    totals = facets[0]['totals'][0] if facets and facets[0]['totals'] else {}
+    stats = {
+        "total_products": totals.get('total_products', 0),
+        "crash_sales_active": totals.get('crash_sales_active', 0),
+        "total_volume": totals.get('total_volume', 0),
+        "avg_price_change": round(totals.get('avg_price_change') or 0, 2),
+        "top_movers": facets[0]['top_movers'] if facets else [],
+        "volume_by_hour": {hour_key(bucket['_id']): bucket['count'] for bucket in hourly},
+        "updated_at": now
+    }
+    await db.market_stats.replace_one({"_id": "global"}, stats, upsert=True)
+    return stats
+
+async def run_market_stats_rollups(lease: "LeaderLease"):
+    # Counters are bumped per purchase in emit_price_events; the aggregates that
+    # cannot be maintained incrementally are refreshed here. The periodic
+    # refresh runs on the leader only; an admin change marking the stats stale
+    # refreshes them from whichever worker served it.
+    track_background_task("market_stats_rollup")
+    while True:
+        try:
+            await asyncio.wait_for(market_stats_stale.wait(), MARKET_STATS_ROLLUP_SECONDS)
+        except asyncio.TimeoutError:
+            if not lease.is_leader:
+                continue
+        market_stats_stale.clear()
+        try:
+            await rollup_market_stats()
+        except PyMongoError as e:
+            logger.warning("Market stats rollup failed: %s", e)
+        except Exception:
+            # The next interval retries; letting this escape would stop the
+            # rollups for the life of the worker.
+            logger.exception("Market stats rollup failed")
 
 @api_router.get("/market/stats")
 async def get_market_stats():
-    products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    
-    if not products:
-        return {
-            "total_products": 0,
-            "crash_sales_active": 0,
-            "avg_price_change": 0,
-            "total_volume": 0
-        }
-    
-    crash_sales = sum(1 for p in products if p.get('crash_sale_active'))
-    total_volume = sum(p.get('purchase_count', 0) for p in products)
+    stats = await read_db.market_stats.find_one({"_id": "global"}, {"_id": 0})
+    if not stats or "total_products" not in stats:
+        stats = await rollup_market_stats()
     
+    cutoff = hour_key(datetime.now(timezone.utc) - timedelta(hours=23))
     return {
-        "total_products": len(products),
-        "crash_sales_active": crash_sales,
-        "total_volume": total_volume
+        "total_products": stats['total_products'],
+        "crash_sales_active": stats['crash_sales_active'],
+        "avg_price_change": stats['avg_price_change'],
+        "total_volume": stats['total_volume'],
+        "volume_24h": sum(count for hour, count in stats.get('volume_by_hour', {}).items() if hour >= cutoff),
+        "top_movers": stats['top_movers'],
+        "updated_at": stats['updated_at']
     }
 
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    lines = http_request_seconds.render() + mongo_command_seconds.render()
+    hasher = password_hasher.stats()
+    for key, kind in (("active", "gauge"), ("queued", "gauge"), ("completed", "counter"), ("rejected", "counter")):
+        suffix = "_total" if kind == "counter" else ""
+        lines += [
+            f"# TYPE brandit_password_hasher_{key}{suffix} {kind}",
+            f"brandit_password_hasher_{key}{suffix} {hasher[key]}"
+        ]
+    lines += [
+        "# TYPE brandit_payment_gateway_circuit_open gauge",
+        f"brandit_payment_gateway_circuit_open {int(payment_gateway.breaker.state == 'open')}"
+    ]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 
 logging.basicConfig(
     level=logging.INFO,
@@ -568,6 +2325,190 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+async def ensure_price_ticks_collection():
+    if "price_ticks" in await db.list_collection_names(filter={"name": "price_ticks"}):
+        return
+    try:
+        await db.create_collection(
+            "price_ticks",
+            timeseries={"timeField": "timestamp", "metaField": "product_id", "granularity": "seconds"},
+            expireAfterSeconds=PRICE_TICK_RETENTION_DAYS * 86400
+        )
+    except CollectionInvalid:
+        return
+    except OperationFailure as e:
+        # Time-series collections, like $dateTrunc and the pipeline updates
+        # used for pricing, need MongoDB 5.0 or newer.
+        raise RuntimeError(f"Could not create the price_ticks time-series collection; BrandIt needs MongoDB 5.0+ ({e})") from e
+    await backfill_price_ticks()
+
+async def backfill_price_ticks():
+    # Runs once, when price_ticks is first created: seed it from the capped
+    # price_history each product already carries so charts are not empty.
+    batch = []
+    async for product in db.products.find({"price_history.0": {"$exists": True}}, {"id": 1, "price_history": 1}):
+        for entry in product['price_history']:
+            timestamp = entry.get('timestamp')
+            if isinstance(timestamp, str):
+                timestamp = datetime.fromisoformat(timestamp)
+            if timestamp is None:
+                continue
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            batch.append({"product_id": product['id'], "timestamp": timestamp,
+                          "price": entry['price'], "event": entry.get('event', "purchase")})
+        if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+            await db.price_ticks.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.price_ticks.insert_many(batch, ordered=False)
+
+async def ensure_indexes():
+    for collection, indexes in REQUIRED_INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error("Could not create indexes on %s: %s", collection, e)
+    for collection, names in OBSOLETE_INDEXES.items():
+        for name in names:
+            try:
+                await db[collection].drop_index(name)
+            except OperationFailure:
+                pass
+
+def plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get('stage')]
+    for child in plan.get('inputStages', []) + [plan.get('inputStage')]:
+        if child:
+            stages.extend(plan_stages(child))
+    return [stage for stage in stages if stage]
+
+async def audit_query_plans():
+    for collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort, ASCENDING)
+        try:
+            explain = await cursor.explain()
+        except PyMongoError as e:
+            logger.warning("Could not explain query on %s %s: %s", collection, list(query), e)
+            continue
+        stages = plan_stages(explain['queryPlanner']['winningPlan'])
+        if "COLLSCAN" in stages:
+            logger.warning("Query on %s %s uses a collection scan: %s", collection, list(query), " <- ".join(stages))
+        else:
+            logger.info("Query on %s %s: %s", collection, list(query), " <- ".join(stages))
+
+class LeaderLease:
+    # A renewable lease in the leases collection; whichever worker holds it runs
+    # the deployment-wide periodic jobs. A worker that dies simply stops
+    # renewing and another takes over once the lease expires.
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    async def renew(self) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            await db.leases.update_one(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True
+            )
+            leader = True
+        except DuplicateKeyError:
+            # The lease exists and is held by someone else, so the upsert collided.
+            leader = False
+        if leader != self.is_leader:
+            logger.info("Worker %s %s leadership of %s", self.owner, "acquired" if leader else "lost", self.name)
+        self.is_leader = leader
+        return leader
+
+    async def release(self):
+        if self.is_leader:
+            self.is_leader = False
+            await db.leases.delete_one({"_id": self.name, "owner": self.owner})
+
+async def run_leader_jobs():
+    track_background_task("leader_election")
+    lease = LeaderLease("periodic-jobs", LEADER_LEASE_SECONDS)
+    jobs = [start_background_task(run_market_stats_rollups(lease), "Market stats rollup")]
+    audited = not INDEX_AUDIT
+    try:
+        while True:
+            try:
+                await lease.renew()
+            except PyMongoError as e:
+                logger.warning("Leader lease renewal failed: %s", e)
+                lease.is_leader = False
+            if lease.is_leader and not audited:
+                # Plans only change with indexes or deploys, so one worker
+                # explaining the hot queries once is enough.
+                audited = True
+                jobs.append(start_background_task(audit_query_plans(), "Index audit"))
+            await asyncio.sleep(LEADER_LEASE_SECONDS / 3)
+    finally:
+        for job in jobs:
+            job.cancel()
+            await finish_background_task(job)
+        try:
+            await lease.release()
+        except PyMongoError as e:
+            logger.warning("Could not release leader lease: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db, read_db, payment_gateway, otp_store, password_hasher, admin_cache
+    global catalog_cache, price_ticker, market_stats_stale, price_outbox
+    client = app.state.mongo_client_factory()
+    db = client[DB_NAME]
+    read_db = client.get_database(DB_NAME, read_preference=make_read_preference())
+    payment_gateway = make_payment_gateway()
+    otp_store = make_otp_store()
+    # Everything below is torn down at shutdown, so it is built per lifespan
+    # and an app from create_app() can be started again.
+    password_hasher = PasswordHasher(BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+    admin_cache = AdminPrincipalCache(ADMIN_CACHE_TTL_SECONDS)
+    catalog_cache = ProductCatalogCache()
+    price_ticker = PriceTickerHub()
+    market_stats_stale = asyncio.Event()
+    price_outbox = PriceOutboxConsumer()
+    
+    await ensure_price_ticks_collection()
+    await ensure_indexes()
+    catalog_cache.start()
+    price_outbox.start()
+    leader_jobs = start_background_task(run_leader_jobs(), "Leader jobs")
+    try:
+        yield
+    finally:
+        # uvicorn has stopped accepting requests; end open price streams, stop
+        # periodic work, let the outbox finish its batch, then close connections.
+        price_ticker.close()
+        leader_jobs.cancel()
+        await finish_background_task(leader_jobs)
+        await catalog_cache.stop()
+        await price_outbox.stop(SHUTDOWN_GRACE_SECONDS)
+        password_hasher.shutdown()
+        await payment_gateway.aclose()
+        await otp_store.aclose()
+        client.close()
+
+def create_app(mongo_client_factory=make_mongo_client) -> FastAPI:
+    # For several workers: uvicorn server:create_app --factory --workers N
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+    app.state.mongo_client_factory = mongo_client_factory
+    app.include_router(api_router)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(MetricsMiddleware)
+    return app
+
+app = create_app()
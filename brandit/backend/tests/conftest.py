@@ -0,0 +1,45 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "brandit_test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    # In-memory stand-in for the primary and read handles server.py uses.
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import server
+    database = mongomock_motor.AsyncMongoMockClient(tz_aware=True)["brandit_test"]
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "read_db", database)
+    return database
+
+
+@pytest.fixture
+def mock_app(monkeypatch):
+    # The app on an in-memory database.
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import server
+    mongo = mongomock_motor.AsyncMongoMockClient(tz_aware=True)
+    # mongomock cannot create time-series collections; a plain one lets startup skip that.
+    asyncio.run(mongo[server.DB_NAME].create_collection("price_ticks"))
+    monkeypatch.setattr(server, "INDEX_AUDIT", False)
+    return server.create_app(lambda: mongo)
+
+
+@pytest.fixture
+def api(mock_app):
+    # A client for the running app, with an admin token for protected routes.
+    from fastapi.testclient import TestClient
+    with TestClient(mock_app) as http:
+        response = http.post("/api/admin/register", json={
+            "email": "admin@example.com", "password": "correct-horse", "name": "Admin"
+        })
+        http.headers["Authorization"] = f"Bearer {response.json()['token']}"
+        yield http
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from pymongo.errors import OperationFailure
+
+import server
+
+
+class FailingChangeStream:
+    def __init__(self, error):
+        self.error = error
+        self.opened = 0
+
+    def watch(self, **kwargs):
+        self.opened += 1
+        raise self.error
+
+
+class PoisonedChangeStream:
+    # Opens fine, then delivers an event the cache cannot apply.
+    def __init__(self):
+        self.opened = 0
+
+    def watch(self, **kwargs):
+        self.opened += 1
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return {"operationType": "update", "documentKey": {"_id": "x"},
+                "fullDocument": {"_id": "x", "id": "p1", "created_at": "not a date"}}
+
+
+def run_watcher(monkeypatch, products):
+    monkeypatch.setattr(server, "db", SimpleNamespace(products=products))
+    monkeypatch.setattr(server, "CATALOG_POLL_INTERVAL", 0.001)
+    cache = server.ProductCatalogCache()
+    polled = []
+
+    async def poll():
+        polled.append(cache._loaded)
+
+    cache._poll = poll
+    cache._loaded = True
+    asyncio.run(asyncio.wait_for(cache._watch(), 5))
+    return polled
+
+
+def test_persistent_change_stream_errors_fall_back_to_polling(monkeypatch):
+    products = FailingChangeStream(OperationFailure("not authorized on brandit to execute command", code=13))
+    assert run_watcher(monkeypatch, products) == [False]
+    assert products.opened == server.CATALOG_WATCH_MAX_FAILURES
+
+
+def test_unappliable_change_events_invalidate_and_retry(monkeypatch):
+    products = PoisonedChangeStream()
+    assert run_watcher(monkeypatch, products) == [False]
+    assert products.opened == server.CATALOG_WATCH_MAX_FAILURES
+
+
+def test_dead_background_task_is_reported_when_it_dies(caplog):
+    async def crash():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        task = server.start_background_task(crash(), "Doomed job")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert "Doomed job background task died" in caplog.text
+        await server.finish_background_task(task)
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(scenario())
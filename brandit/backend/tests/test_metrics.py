@@ -0,0 +1,38 @@
+import asyncio
+
+import server
+
+
+def run_request(app, path):
+    scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(server.MetricsMiddleware(app)(scope, receive, send))
+    return sent
+
+
+def response_app(content_type, body=b""):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type)]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+def test_event_streams_stay_out_of_latency_metrics(monkeypatch):
+    observed = []
+    monkeypatch.setattr(server.http_request_seconds, "observe", lambda *args: observed.append(args))
+    monkeypatch.setattr(server, "SLOW_REQUEST_SECONDS", 0)
+
+    run_request(response_app(b"text/event-stream"), "/api/stream/prices")
+    assert observed == []
+
+    run_request(response_app(b"application/json", b"{}"), "/api/products")
+    assert len(observed) == 1
+    assert observed[0][1] == "GET" and observed[0][3] == "200"
@@ -0,0 +1,79 @@
+import asyncio
+
+import server
+
+
+def insert_orders(*orders):
+    docs = [
+        {"id": order_id, "user_id": "user-1", "email": "a@example.com", "products": [],
+         "total_amount": 10.0, "payment_status": "pending", "created_at": created_at}
+        for order_id, created_at in orders
+    ]
+    asyncio.run(server.db.orders.insert_many(docs))
+
+
+def test_order_pages_follow_created_at_then_id(api):
+    insert_orders(
+        ("a", "2024-01-01T00:00:00+00:00"),
+        ("b", "2024-01-02T00:00:00+00:00"),
+        ("c", "2024-01-02T00:00:00+00:00"),
+        ("d", "2024-01-02T00:00:00+00:00"),
+        ("e", "2024-01-03T00:00:00+00:00"),
+    )
+    seen, after = [], None
+    while True:
+        params = {"limit": 2, **({"after": after} if after else {})}
+        page = api.get("/api/orders/user/user-1", params=params).json()
+        if not page:
+            break
+        seen += [order["id"] for order in page]
+        after = page[-1]["id"]
+    assert seen == ["e", "d", "c", "b", "a"]
+
+
+def test_order_fields_are_projected_and_unknown_fields_rejected(api):
+    insert_orders(("a", "2024-01-01T00:00:00+00:00"))
+    orders = api.get("/api/orders/user/user-1", params={"fields": "total_amount"}).json()
+    assert orders == [{"id": "a", "total_amount": 10.0}]
+
+    response = api.get("/api/orders/user/user-1", params={"fields": "total_amount,password"})
+    assert response.status_code == 400
+
+    response = api.get("/api/orders/user/user-1", params={"after": "missing"})
+    assert response.status_code == 400
+
+
+def test_order_summary_counts_and_points_past_the_recent_orders(api, monkeypatch):
+    # mongomock has no array_filters; rebuild the summary the way a missed
+    # update would.
+    async def record_order_completed(order):
+        await server.rebuild_order_summary(order["user_id"])
+    monkeypatch.setattr(server, "record_order_completed", record_order_completed)
+    monkeypatch.setattr(server, "ORDER_SUMMARY_RECENT", 2)
+
+    product = api.post("/api/products", json={
+        "name": "Widget", "description": "A widget", "category": "Hardware",
+        "image_url": "https://example.com/widget.jpg", "base_price": 100, "max_retail_price": 1000,
+    }).json()
+    created = []
+    for _ in range(3):
+        response = api.post("/api/orders/create", json={
+            "user_id": "user-1", "email": "a@example.com", "products": [{"id": product["id"]}]
+        })
+        created.append(response.json())
+    first = created[0]
+    response = api.post("/api/orders/verify-payment", json={
+        "order_id": first["order_id"], "razorpay_order_id": first["razorpay_order_id"],
+        "razorpay_payment_id": "pay_1", "razorpay_signature": "sig"
+    })
+    assert response.status_code == 200
+
+    summary = api.get("/api/orders/user/user-1/summary").json()
+    assert (summary["total_orders"], summary["completed_orders"], summary["pending_orders"]) == (3, 1, 2)
+    assert summary["lifetime_spend"] == first["amount"]
+    assert [order["id"] for order in summary["recent_orders"]] == [created[2]["order_id"], created[1]["order_id"]]
+    assert summary["next_after"] == created[1]["order_id"]
+
+    older = api.get("/api/orders/user/user-1", params={"after": summary["next_after"]}).json()
+    assert [order["id"] for order in older] == [first["order_id"]]
+    assert older[0]["payment_status"] == "completed"
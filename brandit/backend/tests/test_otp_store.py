@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+import server
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+def test_redis_store_codes_and_token_bucket():
+    async def scenario():
+        store = server.RedisOTPStore(fakeredis.aioredis.FakeRedis(decode_responses=True))
+        await store.put_code("9999999999", "123456", ttl=300)
+        assert await store.get_code("9999999999") == "123456"
+        await store.delete_code("9999999999")
+        assert await store.get_code("9999999999") is None
+
+        waits = [await store.take_token("send:9999999999", 3, 60) for _ in range(4)]
+        await store.aclose()
+        return waits
+
+    waits = asyncio.run(scenario())
+    assert waits[:3] == [0, 0, 0]
+    assert 59 < waits[3] <= 60
+
+
+def test_redis_store_is_shared_between_workers():
+    async def scenario():
+        server_state = fakeredis.FakeServer()
+        first = server.RedisOTPStore(fakeredis.aioredis.FakeRedis(server=server_state, decode_responses=True))
+        second = server.RedisOTPStore(fakeredis.aioredis.FakeRedis(server=server_state, decode_responses=True))
+        await first.put_code("9999999999", "654321", ttl=300)
+        code = await second.get_code("9999999999")
+        assert await first.take_token("verify:9999999999", 1, 60) == 0
+        wait = await second.take_token("verify:9999999999", 1, 60)
+        return code, wait
+
+    code, wait = asyncio.run(scenario())
+    assert code == "654321"
+    assert wait > 0
@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+
+
+def make_gateway(handler, max_retries=2, threshold=5):
+    gateway = server.RazorpayGateway("key", "secret", timeout=1, max_retries=max_retries, pool_size=1,
+                                     breaker=server.CircuitBreaker(threshold, reset_after=30))
+    gateway._client = httpx.AsyncClient(base_url=gateway.BASE_URL, transport=httpx.MockTransport(handler))
+    return gateway
+
+
+def create_order(gateway):
+    async def call():
+        try:
+            return await gateway.create_order(100, "INR", "receipt")
+        finally:
+            await gateway.aclose()
+    return asyncio.run(call())
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    async def sleep(seconds):
+        pass
+    monkeypatch.setattr(server.asyncio, "sleep", sleep)
+
+
+def test_read_timeout_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ReadTimeout("no response", request=request)
+
+    with pytest.raises(server.PaymentGatewayError):
+        create_order(make_gateway(handler))
+    assert len(calls) == 1
+
+
+def test_connect_errors_and_503_are_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        if len(calls) == 2:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"id": "order_1"})
+
+    assert create_order(make_gateway(handler)) == "order_1"
+    assert len(calls) == 3
+
+
+def test_other_5xx_fails_without_retry():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(502)
+
+    gateway = make_gateway(handler, threshold=1)
+    with pytest.raises(server.PaymentGatewayError):
+        create_order(gateway)
+    assert len(calls) == 1
+    assert gateway.breaker.state == "open"
+
+
+def test_half_open_breaker_lets_one_probe_through(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: clock[0])
+    breaker = server.CircuitBreaker(threshold=2, reset_after=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock[0] = 31
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock[0] = 62
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+
+def test_unanswered_probe_frees_the_slot(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: clock[0])
+    breaker = server.CircuitBreaker(threshold=1, reset_after=30)
+    breaker.record_failure()
+    clock[0] = 30
+    assert breaker.allow()
+    clock[0] = 59
+    assert not breaker.allow()
+    clock[0] = 60
+    assert breaker.allow()
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timezone
+
+import server
+
+
+def outbox_event(event_id, product_id):
+    return {"_id": event_id, "product_id": product_id, "status": "pending",
+            "attempts": 0, "created_at": datetime.now(timezone.utc)}
+
+
+def test_failing_product_is_dead_lettered_without_blocking_others(mock_db, monkeypatch):
+    monkeypatch.setattr(server, "OUTBOX_LEASE_SECONDS", 0)
+    monkeypatch.setattr(server, "OUTBOX_MAX_ATTEMPTS", 2)
+    applied = []
+
+    async def update_product_price(product_id, event_id=None):
+        if product_id == "broken":
+            raise TypeError("can't subtract offset-naive and offset-aware datetimes")
+        applied.append(event_id)
+
+    monkeypatch.setattr(server, "update_product_price", update_product_price)
+
+    async def scenario():
+        await mock_db.price_outbox.insert_many([outbox_event("o1:0", "broken"), outbox_event("o2:0", "fine")])
+        consumer = server.PriceOutboxConsumer()
+        assert await consumer.drain_batch() == 2
+        assert applied == ["o2:0"]
+        assert (await mock_db.price_outbox.find_one({"_id": "o1:0"}))["status"] == "processing"
+
+        assert await consumer.drain_batch() == 1
+        assert await consumer.drain_batch() == 0
+        return await mock_db.price_outbox.find({}).to_list(None)
+
+    remaining = asyncio.run(scenario())
+    assert [(event["_id"], event["status"], event["attempts"]) for event in remaining] == [("o1:0", "failed", 2)]
+    assert "offset-naive" in remaining[0]["error"]
+
+
+def test_consumer_survives_unexpected_drain_errors(monkeypatch):
+    monkeypatch.setattr(server, "OUTBOX_POLL_SECONDS", 0.01)
+    consumer = server.PriceOutboxConsumer()
+    calls = []
+
+    async def drain_batch():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        consumer._stopping = True
+        return 0
+
+    consumer.drain_batch = drain_batch
+
+    async def scenario():
+        consumer.start()
+        await asyncio.wait_for(consumer._task, 1)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+
+def product_doc(price_version, price, event="purchase"):
+    return {
+        "_id": "oid-1", "id": "p1", "name": "Widget", "base_price": 100.0, "current_price": price,
+        "crash_sale_active": event == "crash_sale", "purchase_count": price_version,
+        "price_version": price_version, "price_set_at": datetime.now(timezone.utc),
+        "price_history": [{"price": price, "timestamp": "", "event": event}],
+    }
+
+
+@pytest.fixture
+def ticks(monkeypatch):
+    published = []
+    hub = server.PriceTickerHub()
+    monkeypatch.setattr(hub, "publish", lambda product_id, message: published.append(message))
+    monkeypatch.setattr(server, "price_ticker", hub)
+    return published
+
+
+def change(document):
+    return {"operationType": "update", "fullDocument": document, "documentKey": {"_id": document["_id"]}}
+
+
+def test_each_price_change_is_published_once_per_worker(ticks):
+    writer, other = server.ProductCatalogCache(), server.ProductCatalogCache()
+    writer.put(product_doc(0, 100.0))
+    other._apply(change(product_doc(0, 100.0)))
+    assert ticks == []
+
+    # The writing worker publishes right after its write, then sees the same
+    # write again on its change stream; the other worker only sees the latter.
+    writer.put(product_doc(1, 105.0))
+    writer._apply(change(product_doc(1, 105.0)))
+    other._apply(change(product_doc(1, 105.0)))
+    assert [(tick["price"], tick["event"]) for tick in ticks] == [(105.0, "purchase"), (105.0, "purchase")]
+
+    # An older event delivered late publishes nothing.
+    other._apply(change(product_doc(2, 400.0, "crash_sale")))
+    other._apply(change(product_doc(1, 105.0)))
+    assert [tick["type"] for tick in ticks] == ["price", "price", "crash_sale"]
+
+
+def test_polling_reload_publishes_changes_made_elsewhere(mock_db, ticks):
+    async def scenario():
+        cache = server.ProductCatalogCache()
+        await mock_db.products.insert_one(product_doc(3, 120.0))
+        await cache.load()
+        await mock_db.products.update_one({"id": "p1"}, {"$set": {"price_version": 4, "current_price": 126.0}})
+        await cache.load()
+        await cache.load()
+
+    asyncio.run(scenario())
+    assert [tick["price"] for tick in ticks] == [126.0]
@@ -0,0 +1,94 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+NOW = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def product(**fields):
+    return {
+        "id": "p1", "name": "Widget", "base_price": 200.0, "current_price": 200.0,
+        "max_retail_price": 260.0, "price_increment_percent": 10.0, "price_decrement_rate": 0.5,
+        "crash_sale_active": False, "purchase_count": 0, "price_history": [], **fields,
+    }
+
+
+def one_by_one(start, count, now):
+    # What `count` separate purchase_pipeline runs at `now` leave behind.
+    current, history = dict(start), []
+    for _ in range(count):
+        fields, entries = server.fold_purchases(current, 1, now)
+        current.update(fields)
+        history.extend(entries)
+    return current, history
+
+
+@pytest.mark.parametrize("count", [1, 2, 5])
+def test_fold_matches_sequential_purchases(count):
+    start = product(current_price=230.0, last_purchase_time=NOW - timedelta(hours=5))
+    fields, history = server.fold_purchases(start, count, NOW)
+    expected, expected_history = one_by_one(start, count, NOW)
+    assert fields == {k: expected[k] for k in fields}
+    assert history == expected_history
+
+
+def test_crash_in_the_middle_of_a_batch_fires_once():
+    fields, history = server.fold_purchases(product(current_price=230.0), 3, NOW)
+    assert [entry["event"] for entry in history] == ["purchase", "crash_sale", "crash_sale"]
+    assert history[1]["price"] == 130.0
+    assert fields["crash_sale_active"] is True
+    assert fields["current_price"] == pytest.approx(130.0 * 1.1)
+
+
+@pytest.fixture
+def price_writes(mock_db, monkeypatch):
+    # apply_purchases refreshes the cache and publishes; give it this process's state.
+    monkeypatch.setattr(server, "catalog_cache", server.ProductCatalogCache())
+    monkeypatch.setattr(server, "price_ticker", server.PriceTickerHub())
+    monkeypatch.setattr(server, "market_stats_stale", asyncio.Event())
+    return mock_db
+
+
+def test_apply_purchases_accepts_legacy_string_purchase_times(price_writes):
+    last_purchase = datetime.now(timezone.utc) - timedelta(hours=3)
+
+    async def scenario():
+        await price_writes.products.insert_one(product(last_purchase_time=last_purchase.isoformat()))
+        return await server.apply_purchases("p1", ["o1:0", "o2:0"])
+
+    updated = asyncio.run(scenario())
+    # Two idle hours past the grace hour decay 200 to 199 before both increments.
+    assert updated["current_price"] == pytest.approx(199.0 * 1.1 * 1.1, rel=1e-4)
+    assert updated["purchase_count"] == 2
+    assert updated["price_version"] == 1
+
+
+@pytest.mark.skipif(not os.environ.get("MONGO_TEST_URL"), reason="set MONGO_TEST_URL to run against a real mongod")
+@pytest.mark.parametrize("count", [1, 3, 6])
+@pytest.mark.parametrize("last_purchase_time", [None, NOW - timedelta(hours=4), (NOW - timedelta(hours=4)).isoformat()])
+def test_fold_matches_purchase_pipeline(count, last_purchase_time):
+    from pymongo import MongoClient
+
+    mongo = MongoClient(os.environ["MONGO_TEST_URL"], tz_aware=True)
+    collection = mongo["brandit_test"]["pricing_equivalence"]
+    try:
+        collection.delete_many({})
+        start = product(current_price=180.0, last_purchase_time=last_purchase_time)
+        collection.insert_one(dict(start))
+        for i in range(count):
+            collection.update_one({"id": "p1"}, server.purchase_pipeline(NOW, f"event-{i}"))
+        stored = collection.find_one({"id": "p1"})
+
+        fields, history = server.fold_purchases(server.serialize_product(dict(start)), count, NOW)
+        assert stored["current_price"] == pytest.approx(fields["current_price"])
+        assert stored["crash_sale_active"] == fields["crash_sale_active"]
+        assert stored["purchase_count"] == fields["purchase_count"]
+        assert [(entry["price"], entry["event"]) for entry in stored["price_history"]] == \
+            [(pytest.approx(entry["price"]), entry["event"]) for entry in history]
+    finally:
+        collection.drop()
+        mongo.close()
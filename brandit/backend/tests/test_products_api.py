@@ -0,0 +1,90 @@
+import asyncio
+
+import server
+
+PRODUCT = {
+    "name": "Widget", "description": "A widget", "category": "Hardware",
+    "image_url": "https://example.com/widget.jpg", "base_price": 100, "max_retail_price": 1000,
+}
+
+
+def test_purchases_and_crash_sales_do_not_conflict_with_admin_edits(api):
+    product = api.post("/api/products", json=PRODUCT).json()
+    assert product["version"] == 0
+
+    asyncio.run(server.apply_purchases(product["id"], ["order-1:0", "order-2:0"]))
+    response = api.post("/api/admin/crash-sale", json={"product_ids": [product["id"]], "activate": True})
+    assert response.status_code == 200
+
+    traded = api.get(f"/api/products/{product['id']}").json()
+    assert traded["purchase_count"] == 2
+    assert traded["price_version"] == 2
+    assert traded["version"] == 0
+
+    response = api.put(f"/api/admin/products/{product['id']}", json={"name": "Renamed", "expected_version": 0})
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+
+    response = api.put(f"/api/admin/products/{product['id']}", json={"name": "Stale", "expected_version": 0})
+    assert response.status_code == 409
+
+
+def test_app_can_be_started_again(mock_app):
+    from fastapi.testclient import TestClient
+
+    credentials = {"email": "admin@example.com", "password": "correct-horse"}
+    for attempt in range(2):
+        with TestClient(mock_app) as http:
+            if attempt == 0:
+                assert http.post("/api/admin/register", json={**credentials, "name": "Admin"}).status_code == 200
+            assert http.post("/api/admin/login", json=credentials).status_code == 200
+            assert http.post("/api/products", json=PRODUCT).status_code == 200
+
+
+def test_ndjson_export_reimports_with_market_state(api):
+    product = api.post("/api/products", json={**PRODUCT, "price_decrement_rate": 2.0}).json()
+    asyncio.run(server.apply_purchases(product["id"], ["order-1:0", "order-2:0", "order-3:0"]))
+    api.put(f"/api/admin/products/{product['id']}", json={"name": "Renamed"})
+    exported = api.get("/api/admin/products/export").content
+    before = api.get(f"/api/products/{product['id']}").json()
+
+    assert api.delete(f"/api/admin/products/{product['id']}").status_code == 200
+    response = api.post("/api/admin/products/bulk", content=exported)
+    assert response.json()["inserted"] == 1
+
+    after = api.get(f"/api/products/{product['id']}").json()
+    for field in ("name", "current_price", "purchase_count", "price_decrement_rate", "created_at",
+                  "version", "price_version", "price_history", "last_purchase_time"):
+        assert after[field] == before[field], field
+
+
+def test_csv_rows_import_as_new_definitions(api):
+    body = "name,description,category,image_url,base_price,max_retail_price\nLamp,A lamp,Home,u,50,80\n"
+    response = api.post("/api/admin/products/bulk?format=csv", content=body)
+    assert response.json()["inserted"] == 1
+    lamp = next(p for p in api.get("/api/products").json() if p["name"] == "Lamp")
+    assert lamp["current_price"] == 50 and lamp["purchase_count"] == 0
+
+
+def test_non_ascii_otp_is_rejected_not_a_server_error(api):
+    api.post("/api/auth/send-otp", json={"phone_number": "9000000001"})
+    response = api.post("/api/auth/verify-otp", json={"phone_number": "9000000001", "otp": "１２３４５６"})
+    assert response.status_code == 400 and response.json()["detail"] == "Invalid OTP"
+
+
+def test_if_match_is_not_read_as_a_version(api):
+    product = api.post("/api/products", json=PRODUCT).json()
+    etag = api.get(f"/api/products/{product['id']}").headers["etag"]
+    response = api.put(f"/api/admin/products/{product['id']}", json={"name": "Renamed"}, headers={"If-Match": etag})
+    assert response.status_code == 200 and response.json()["name"] == "Renamed"
+
+
+def test_orders_are_priced_from_the_catalog_and_merge_repeated_items(api):
+    product = api.post("/api/products", json=PRODUCT).json()
+    items = [{"id": product["id"], "name": "Widget", "price": 0.01, "quantity": 1}, {"id": product["id"], "quantity": 1}]
+    response = api.post("/api/orders/create", json={"user_id": "user-1", "email": "a@example.com", "products": items})
+    assert response.status_code == 200
+    assert response.json()["amount"] == 2 * product["current_price"]
+
+    order = api.get("/api/orders/user/user-1").json()[0]
+    assert order["products"] == [{"id": product["id"], "name": "Widget", "price": product["current_price"], "quantity": 2}]
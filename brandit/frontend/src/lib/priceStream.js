@@ -0,0 +1,39 @@
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+
+// Ticks cover purchases and crash sales only. Decay, new products and deleted
+// products reach an open page through this slower refetch; the product
+// endpoints answer with an ETag, so an unchanged catalog costs the browser a 304.
+export const CATALOG_REFRESH_MS = 60000;
+
+export function refreshEvery(fetcher, ms = CATALOG_REFRESH_MS) {
+  const timer = setInterval(fetcher, ms);
+  return () => clearInterval(timer);
+}
+
+export function subscribeToPrices(productIds, onTick) {
+  const query = productIds.length ? `?product_ids=${productIds.join(',')}` : '';
+  const source = new EventSource(`${API}/stream/prices${query}`);
+  const handler = (event) => onTick(JSON.parse(event.data));
+  
+  source.addEventListener('price', handler);
+  source.addEventListener('crash_sale', handler);
+  return () => source.close();
+}
+
+export function applyTick(product, tick) {
+  if (!product || product.id !== tick.product_id) {
+    return product;
+  }
+  
+  return {
+    ...product,
+    current_price: tick.price,
+    crash_sale_active: tick.crash_sale_active,
+    purchase_count: tick.purchase_count,
+    price_history: [
+      ...(product.price_history || []),
+      { price: tick.price, timestamp: tick.timestamp, event: tick.event }
+    ].slice(-50)
+  };
+}
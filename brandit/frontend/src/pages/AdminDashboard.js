@@ -100,7 +100,8 @@ export default function AdminDashboard() {
             ...formData,
             base_price: parseFloat(formData.base_price),
             max_retail_price: parseFloat(formData.max_retail_price),
-            price_increment_percent: parseFloat(formData.price_increment_percent)
+            price_increment_percent: parseFloat(formData.price_increment_percent),
+            expected_version: editingProduct.version
           },
           { headers: { Authorization: `Bearer ${token}` } }
         );
@@ -118,7 +119,12 @@ export default function AdminDashboard() {
       resetForm();
       fetchProducts();
     } catch (error) {
-      toast.error('Operation failed');
+      if (error.response?.status === 409) {
+        toast.error('This product changed while you were editing. Reload it and try again.');
+        fetchProducts();
+      } else {
+        toast.error('Operation failed');
+      }
     }
   };
   
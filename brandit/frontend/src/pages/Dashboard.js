@@ -6,12 +6,16 @@ import { Package, Clock, CheckCircle } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const PAGE_SIZE = 10;
 
 export default function Dashboard() {
   const navigate = useNavigate();
   const [user, setUser] = useState(null);
+  const [summary, setSummary] = useState(null);
   const [orders, setOrders] = useState([]);
+  const [nextAfter, setNextAfter] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   useEffect(() => {
     const savedUser = JSON.parse(localStorage.getItem('user') || 'null');
@@ -25,8 +29,10 @@ export default function Dashboard() {
   
   const fetchOrders = async (userId) => {
     try {
-      const response = await axios.get(`${API}/orders/user/${userId}`);
-      setOrders(response.data);
+      const response = await axios.get(`${API}/orders/user/${userId}/summary`);
+      setSummary(response.data);
+      setOrders(response.data.recent_orders);
+      setNextAfter(response.data.next_after);
     } catch (error) {
       console.error('Error fetching orders:', error);
     } finally {
@@ -34,6 +40,21 @@ export default function Dashboard() {
     }
   };
   
+  const loadMoreOrders = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API}/orders/user/${user.id}`, {
+        params: { after: nextAfter, limit: PAGE_SIZE }
+      });
+      setOrders(prev => [...prev, ...response.data]);
+      setNextAfter(response.data.length === PAGE_SIZE ? response.data[PAGE_SIZE - 1].id : null);
+    } catch (error) {
+      console.error('Error fetching orders:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+  
   const handleLogout = () => {
     localStorage.removeItem('user');
     navigate('/');
@@ -64,14 +85,14 @@ export default function Dashboard() {
           <div className="bg-[#121212] border border-[#2A2A2A] p-6 rounded-sm">
             <Package className="text-[#00FF94] mb-2" size={32} />
             <div className="text-xs text-[#A1A1AA] uppercase tracking-wider mb-1">Total Orders</div>
-            <div className="font-mono text-4xl font-bold text-[#EDEDED]" data-testid="total-orders">{orders.length}</div>
+            <div className="font-mono text-4xl font-bold text-[#EDEDED]" data-testid="total-orders">{summary?.total_orders ?? 0}</div>
           </div>
           
           <div className="bg-[#121212] border border-[#2A2A2A] p-6 rounded-sm">
             <CheckCircle className="text-[#00FF94] mb-2" size={32} />
             <div className="text-xs text-[#A1A1AA] uppercase tracking-wider mb-1">Completed</div>
             <div className="font-mono text-4xl font-bold text-[#EDEDED]">
-              {orders.filter(o => o.payment_status === 'completed').length}
+              {summary?.completed_orders ?? 0}
             </div>
           </div>
           
@@ -79,7 +100,7 @@ export default function Dashboard() {
             <Clock className="text-[#FACC15] mb-2" size={32} />
             <div className="text-xs text-[#A1A1AA] uppercase tracking-wider mb-1">Pending</div>
             <div className="font-mono text-4xl font-bold text-[#EDEDED]">
-              {orders.filter(o => o.payment_status === 'pending').length}
+              {summary?.pending_orders ?? 0}
             </div>
           </div>
         </div>
@@ -103,7 +124,7 @@ export default function Dashboard() {
                   key={order.id}
                   initial={{ opacity: 0, y: 20 }}
                   animate={{ opacity: 1, y: 0 }}
-                  transition={{ delay: index * 0.1 }}
+                  transition={{ delay: (index % PAGE_SIZE) * 0.1 }}
                   className="bg-[#121212] border border-[#2A2A2A] p-6 rounded-sm"
                   data-testid="order-item"
                 >
@@ -148,6 +169,16 @@ export default function Dashboard() {
                   </div>
                 </motion.div>
               ))}
+              {nextAfter && (
+                <button
+                  onClick={loadMoreOrders}
+                  disabled={loadingMore}
+                  className="w-full bg-[#1E1E1E] border border-[#2A2A2A] text-[#EDEDED] px-6 py-3 rounded-sm font-bold hover:border-[#00FF94] transition-colors disabled:opacity-50"
+                  data-testid="load-more-orders"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              )}
             </div>
           ) : (
             <div className="text-center py-16 bg-[#121212] border border-[#2A2A2A] rounded-sm" data-testid="no-orders-message">
@@ -5,6 +5,7 @@ import { CrashBanner } from '../components/custom/CrashBanner';
 import axios from 'axios';
 import { motion } from 'framer-motion';
 import { Zap, TrendingUp } from 'lucide-react';
+import { subscribeToPrices, applyTick, refreshEvery } from '../lib/priceStream';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -26,8 +27,14 @@ export default function Landing() {
     };
     
     fetchProducts();
-    const interval = setInterval(fetchProducts, 30000);
-    return () => clearInterval(interval);
+    const stopRefresh = refreshEvery(fetchProducts);
+    const unsubscribe = subscribeToPrices([], (tick) => {
+      setProducts(current => current.map(product => applyTick(product, tick)));
+    });
+    return () => {
+      stopRefresh();
+      unsubscribe();
+    };
   }, []);
   
   const crashProducts = products.filter(p => p.crash_sale_active);
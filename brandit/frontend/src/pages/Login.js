@@ -31,7 +31,7 @@ export default function Login() {
       toast.success(`OTP sent! (Demo: ${response.data.otp})`);
       setStep('otp');
     } catch (error) {
-      toast.error('Failed to send OTP');
+      toast.error(error.response?.data?.detail || 'Failed to send OTP');
       console.error(error);
     } finally {
       setLoading(false);
@@ -3,6 +3,7 @@ import { TickerCard } from '../components/custom/TickerCard';
 import axios from 'axios';
 import { motion } from 'framer-motion';
 import { Search, SlidersHorizontal } from 'lucide-react';
+import { subscribeToPrices, applyTick, refreshEvery } from '../lib/priceStream';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -28,8 +29,14 @@ export default function Marketplace() {
     };
     
     fetchProducts();
-    const interval = setInterval(fetchProducts, 30000);
-    return () => clearInterval(interval);
+    const stopRefresh = refreshEvery(fetchProducts);
+    const unsubscribe = subscribeToPrices([], (tick) => {
+      setProducts(current => current.map(product => applyTick(product, tick)));
+    });
+    return () => {
+      stopRefresh();
+      unsubscribe();
+    };
   }, []);
   
   useEffect(() => {
@@ -5,17 +5,54 @@ import { motion } from 'framer-motion';
 import { AreaChart, Area, XAxis, YAxis, Tooltip, ResponsiveContainer } from 'recharts';
 import { TrendingUp, TrendingDown, Zap, ArrowLeft, ShoppingCart, Zap as Lightning } from 'lucide-react';
 import { toast } from 'sonner';
+import { subscribeToPrices, applyTick, refreshEvery } from '../lib/priceStream';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const BUCKET_MS = 15 * 60 * 1000;
+
+// Folds a live tick into the 15-minute buckets so the chart moves between
+// refetches: the tick extends the last bucket, or opens the next one.
+function addTickToBuckets(buckets, tick) {
+  if (buckets.length === 0) {
+    return buckets;
+  }
+  const last = buckets[buckets.length - 1];
+  const start = Math.floor(new Date(tick.timestamp).getTime() / BUCKET_MS) * BUCKET_MS;
+  if (start <= new Date(last.timestamp).getTime()) {
+    return [...buckets.slice(0, -1), {
+      ...last,
+      high: Math.max(last.high, tick.price),
+      low: Math.min(last.low, tick.price),
+      close: tick.price,
+      volume: last.volume + 1
+    }];
+  }
+  return [...buckets, {
+    timestamp: new Date(start).toISOString(),
+    open: tick.price, high: tick.price, low: tick.price, close: tick.price, volume: 1
+  }];
+}
 
 export default function ProductDetail() {
   const { id } = useParams();
   const navigate = useNavigate();
   const [product, setProduct] = useState(null);
+  const [history, setHistory] = useState([]);
   const [loading, setLoading] = useState(true);
   
   useEffect(() => {
+    // History is optional: if it fails the chart falls back to the
+    // price_history carried on the product.
+    const fetchHistory = async () => {
+      try {
+        const response = await axios.get(`${API}/products/${id}/history`, { params: { resolution: '15m' } });
+        setHistory(response.data.buckets);
+      } catch (error) {
+        console.error('Error fetching price history:', error);
+      }
+    };
+    
     const fetchProduct = async () => {
       try {
         const response = await axios.get(`${API}/products/${id}`);
@@ -28,9 +65,27 @@ export default function ProductDetail() {
       }
     };
     
+    const refreshProduct = async () => {
+      try {
+        const response = await axios.get(`${API}/products/${id}`);
+        setProduct(response.data);
+      } catch (error) {
+        console.error('Error refreshing product:', error);
+      }
+      fetchHistory();
+    };
+    
     fetchProduct();
-    const interval = setInterval(fetchProduct, 15000);
-    return () => clearInterval(interval);
+    fetchHistory();
+    const stopRefresh = refreshEvery(refreshProduct);
+    const unsubscribe = subscribeToPrices([id], (tick) => {
+      setProduct(current => applyTick(current, tick));
+      setHistory(current => addTickToBuckets(current, tick));
+    });
+    return () => {
+      stopRefresh();
+      unsubscribe();
+    };
   }, [id]);
   
   const addToCart = () => {
@@ -77,9 +132,15 @@ export default function ProductDetail() {
     );
   }
   
-  const chartData = product.price_history.slice(-24).map(item => ({
-    time: new Date(item.timestamp).toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' }),
-    price: item.price
+  // A product nobody has traded for a day has no recent buckets; chart the
+  // last price changes it carries instead of an empty box.
+  const recentHistory = history.length > 0;
+  const chartPoints = recentHistory
+    ? history.map(bucket => ({ timestamp: bucket.timestamp, price: bucket.close }))
+    : product.price_history;
+  const chartData = chartPoints.map(point => ({
+    time: new Date(point.timestamp).toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' }),
+    price: point.price
   }));
   
   const priceChange = product.price_history.length >= 2
@@ -114,7 +175,7 @@ export default function ProductDetail() {
             </div>
             
             <div className="bg-[#121212] border border-[#2A2A2A] p-6 rounded-sm">
-              <div className="text-xs text-[#A1A1AA] uppercase tracking-wider mb-4">Price History (24h)</div>
+              <div className="text-xs text-[#A1A1AA] uppercase tracking-wider mb-4">{recentHistory ? 'Price History (24h)' : 'Recent Price Changes'}</div>
               {chartData.length > 0 ? (
                 <ResponsiveContainer width="100%" height={250}>
                   <AreaChart data={chartData}>
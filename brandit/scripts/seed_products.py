@@ -1,12 +1,17 @@
 import requests
+import json
 import os
 from dotenv import load_dotenv
 
 load_dotenv('/app/backend/.env')
 
-BACKEND_URL = "https://tradable-goods.preview.emergentagent.com"
+BACKEND_URL = os.environ.get("BACKEND_URL", "https://tradable-goods.preview.emergentagent.com")
 API = f"{BACKEND_URL}/api"
 
+# The bulk import is an admin endpoint; defaults match create_admin.py.
+ADMIN_EMAIL = os.environ.get("ADMIN_EMAIL", "admin@brandit.com")
+ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin123")
+
 products = [
     {
         "name": "Cyber Deck 2077",
@@ -84,15 +89,26 @@ products = [
 
 def seed_products():
     print("Seeding products...")
-    for product in products:
-        try:
-            response = requests.post(f"{API}/products", json=product)
-            if response.status_code == 200:
-                print(f"✓ Added: {product['name']}")
-            else:
-                print(f"✗ Failed to add: {product['name']} - {response.text}")
-        except Exception as e:
-            print(f"✗ Error adding {product['name']}: {str(e)}")
+    try:
+        response = requests.post(f"{API}/admin/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+        response.raise_for_status()
+        token = response.json()['token']
+        
+        body = "\n".join(json.dumps(product) for product in products)
+        response = requests.post(
+            f"{API}/admin/products/bulk",
+            data=body.encode(),
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"}
+        )
+        response.raise_for_status()
+    except Exception as e:
+        print(f"✗ Error seeding products: {str(e)}")
+        return
+    
+    result = response.json()
+    print(f"✓ Added: {result['inserted']}")
+    for error in result['errors']:
+        print(f"✗ Line {error['line']}: {error['error']}")
     
     print("\nSeeding complete!")
 
@@ -0,0 +1,292 @@
+"""Offline simulation of the brandit dynamic pricing model.
+
+Re-implements the rules applied by update_product_price with NumPy, vectorized
+across products, so whole catalogues and millions of purchases can be priced
+in seconds:
+
+- a price holds for an hour after a purchase, then decays linearly by
+  price_decrement_rate per hour, never below half the base price;
+- each purchase pays the (decayed) current price and then raises it by
+  price_increment_percent;
+- a raise that reaches max_retail_price triggers a crash sale instead, which
+  drops the price to half the maximum retail price.
+
+Synthetic mode draws a catalogue and Poisson purchase streams:
+
+    python scripts/simulate_pricing.py --products 5000 --events 2000000 \\
+        --increment 5,8,12 --decrement 0.25,0.5,1
+
+Replay mode takes the recorded purchases of real products, either from a
+GET /api/products export (price_history, last entries only) or from the
+price_ticks collection (full history), and re-runs them under candidate
+parameters:
+
+    curl -s $BACKEND/api/products > products.json
+    python scripts/simulate_pricing.py --replay products.json --increment 6,8
+    python scripts/simulate_pricing.py --replay-mongo --increment 6,8
+
+Each parameter combination is reported with revenue, crash counts and final
+prices; --trace-csv writes per-purchase price trajectories for a sample of
+products.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+PURCHASE_EVENTS = ("purchase", "crash_sale")
+DECAY_GRACE_HOURS = 1.0
+FLOOR_FRACTION = 0.5
+CRASH_FRACTION = 0.5
+
+
+class Catalogue:
+    # Per-product parameters plus every product's purchase times (hours from
+    # the start), stored flat and grouped by product.
+    def __init__(self, ids, base_price, max_retail_price, increment_percent, decrement_rate, counts, times,
+                 horizon, recorded=None):
+        self.ids = list(ids)
+        self.base_price = np.asarray(base_price, dtype=np.float64)
+        self.max_retail_price = np.asarray(max_retail_price, dtype=np.float64)
+        self.increment_percent = np.asarray(increment_percent, dtype=np.float64)
+        self.decrement_rate = np.asarray(decrement_rate, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)[:-1]]).astype(np.int64)
+        self.horizon = float(horizon)
+        self.recorded = recorded
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def decay(price, last_purchase, decrement_rate, floor, now):
+    # Vectorized decayed_price(); NaN last_purchase means never purchased.
+    idle = now - last_purchase
+    decayed = np.minimum(price, np.maximum(price - decrement_rate * (idle - DECAY_GRACE_HOURS), floor))
+    return np.where(np.isnan(last_purchase) | (idle <= DECAY_GRACE_HOURS), price, decayed)
+
+
+def simulate(catalogue, increment_percent=None, decrement_rate=None, trace=()):
+    """Run every purchase through the pricing rules.
+
+    increment_percent / decrement_rate override the catalogue's per-product
+    values when given. Products are processed in lock-step by purchase rank:
+    step r applies the r-th purchase of every product that has one, so the
+    Python loop runs once per purchase of the busiest product rather than once
+    per event.
+    """
+    n = len(catalogue)
+    increment = np.broadcast_to(
+        catalogue.increment_percent if increment_percent is None else increment_percent, n) / 100
+    rate = np.broadcast_to(catalogue.decrement_rate if decrement_rate is None else decrement_rate, n)
+    floor = catalogue.base_price * FLOOR_FRACTION
+    crash_price = catalogue.max_retail_price * CRASH_FRACTION
+
+    price = catalogue.base_price.copy()
+    last_purchase = np.full(n, np.nan)
+    revenue = np.zeros(n)
+    crashes = np.zeros(n, dtype=np.int64)
+    first_crash = np.full(n, np.nan)
+
+    order = np.argsort(-catalogue.counts, kind="stable")
+    descending = -catalogue.counts[order]
+    trace = np.asarray(trace, dtype=np.int64)
+    trajectories = {int(p): [] for p in trace}
+
+    for rank in range(int(catalogue.counts.max(initial=0))):
+        active = order[:np.searchsorted(descending, -rank, side="left")]
+        now = catalogue.times[catalogue.offsets[active] + rank]
+        paid = decay(price[active], last_purchase[active], rate[active], floor[active], now)
+        revenue[active] += paid
+        raised = paid * (1 + increment[active])
+        crashed = raised >= catalogue.max_retail_price[active]
+        price[active] = np.where(crashed, crash_price[active], raised)
+        last_purchase[active] = now
+        if crashed.any():
+            crashed_products = active[crashed]
+            crashes[crashed_products] += 1
+            first_crash[crashed_products] = np.fmin(first_crash[crashed_products], now[crashed])
+        for product in trace[catalogue.counts[trace] > rank]:
+            trajectories[int(product)].append(
+                (float(catalogue.times[catalogue.offsets[product] + rank]), float(price[product])))
+
+    final_price = decay(price, last_purchase, rate, floor, catalogue.horizon)
+    return {
+        "revenue": revenue,
+        "crashes": crashes,
+        "first_crash": first_crash,
+        "final_price": final_price,
+        "trajectories": trajectories,
+    }
+
+
+def synthetic_catalogue(products, events, horizon, rng):
+    base_price = np.round(rng.lognormal(np.log(1000), 0.6, products), 2)
+    max_retail_price = np.round(base_price * rng.uniform(2, 5, products), 2)
+    increment_percent = np.round(rng.uniform(5, 12, products), 1)
+    decrement_rate = np.full(products, 0.5)
+    # A few hot products take most of the traffic.
+    popularity = rng.lognormal(0, 1.0, products)
+    counts = rng.multinomial(events, popularity / popularity.sum())
+    owner = np.repeat(np.arange(products), counts)
+    times = rng.uniform(0, horizon, counts.sum())
+    times = times[np.lexsort((times, owner))]
+    ids = [f"synthetic-{i}" for i in range(products)]
+    return Catalogue(ids, base_price, max_retail_price, increment_percent, decrement_rate, counts, times, horizon)
+
+
+def parse_time(value):
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def replay_catalogue(products, purchases):
+    # products: product documents; purchases: {product_id: [(datetime, price after)]}.
+    # Replays start from base_price at the first recorded purchase. Recorded
+    # events stay labelled crash_sale for as long as the sale is active, so a
+    # crash is recognised by the price landing on half the maximum retail price.
+    stamps = [t for product in products for t, _ in purchases.get(product['id'], [])]
+    if not stamps:
+        raise SystemExit("No recorded purchases to replay")
+    start = min(stamps)
+    end = datetime.now(timezone.utc)
+    counts, times = [], []
+    recorded = {"crashes": [], "final_price": []}
+    for product in products:
+        events = sorted(purchases.get(product['id'], []), key=lambda e: e[0])
+        crash_price = product['max_retail_price'] * CRASH_FRACTION
+        counts.append(len(events))
+        times.extend((t - start).total_seconds() / 3600 for t, _ in events)
+        recorded["crashes"].append(sum(1 for _, price in events if np.isclose(price, crash_price)))
+        recorded["final_price"].append(product['current_price'])
+    return Catalogue(
+        [p['id'] for p in products],
+        [p['base_price'] for p in products],
+        [p['max_retail_price'] for p in products],
+        [p.get('price_increment_percent', 5.0) for p in products],
+        [p.get('price_decrement_rate', 0.5) for p in products],
+        counts, times, (end - start).total_seconds() / 3600,
+        recorded={k: np.asarray(v, dtype=np.float64) for k, v in recorded.items()}
+    )
+
+
+def load_replay_file(path):
+    with open(path) as f:
+        products = json.load(f)
+    purchases = {
+        p['id']: [(parse_time(e['timestamp']), e['price'])
+                  for e in p.get('price_history', []) if e.get('event') in PURCHASE_EVENTS]
+        for p in products
+    }
+    return replay_catalogue(products, purchases)
+
+
+def load_replay_mongo():
+    from pymongo import MongoClient
+
+    client = MongoClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    products = list(db.products.find({}, {"_id": 0}))
+    purchases = {}
+    cursor = db.price_ticks.find(
+        {"event": {"$in": list(PURCHASE_EVENTS)}}, {"_id": 0, "product_id": 1, "timestamp": 1, "price": 1}
+    )
+    for tick in cursor:
+        purchases.setdefault(tick['product_id'], []).append((tick['timestamp'], tick['price']))
+    client.close()
+    return replay_catalogue(products, purchases)
+
+
+def parse_values(text):
+    return [float(v) for v in text.split(",")] if text else [None]
+
+
+def describe(value, default):
+    return "current" if value is None else f"{value:g}{default}"
+
+
+def report(catalogue, runs):
+    total_events = int(catalogue.counts.sum())
+    print(f"{len(catalogue)} products, {total_events:,} purchases over {catalogue.horizon:,.0f}h\n")
+    header = (f"{'increment':>10}{'decrement':>11}{'revenue':>16}{'rev/purchase':>14}{'crashes':>10}"
+              f"{'crashed %':>11}{'1st crash h':>13}{'final/base p50':>16}{'p95':>8}")
+    print(header)
+    for (increment, decrement), result in runs:
+        ratio = result["final_price"] / catalogue.base_price
+        crashed = result["crashes"] > 0
+        first_crash = np.nanmedian(result["first_crash"]) if crashed.any() else float("nan")
+        print(f"{describe(increment, '%'):>10}{describe(decrement, '/h'):>11}"
+              f"{result['revenue'].sum():>16,.0f}{result['revenue'].sum() / max(total_events, 1):>14,.2f}"
+              f"{int(result['crashes'].sum()):>10,}{crashed.mean() * 100:>10.1f}%{first_crash:>13,.1f}"
+              f"{np.percentile(ratio, 50):>16.2f}{np.percentile(ratio, 95):>8.2f}")
+    if catalogue.recorded is not None:
+        recorded_ratio = catalogue.recorded["final_price"] / catalogue.base_price
+        print(f"\nrecorded history: {int(catalogue.recorded['crashes'].sum()):,} crashes, "
+              f"final/base p50 {np.percentile(recorded_ratio, 50):.2f} p95 {np.percentile(recorded_ratio, 95):.2f}")
+
+
+def write_traces(path, catalogue, runs):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["increment_percent", "decrement_rate", "product_id", "hours", "price"])
+        for (increment, decrement), result in runs:
+            for product, points in result["trajectories"].items():
+                for hours, price in points:
+                    writer.writerow([increment, decrement, catalogue.ids[product], round(hours, 4), round(price, 2)])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--replay", metavar="FILE", help="JSON export of GET /api/products")
+    source.add_argument("--replay-mongo", action="store_true", help="replay price_ticks from MONGO_URL/DB_NAME")
+    parser.add_argument("--products", type=int, default=1000, help="synthetic products")
+    parser.add_argument("--events", type=int, default=1_000_000, help="synthetic purchases")
+    parser.add_argument("--hours", type=float, default=24 * 30, help="synthetic horizon")
+    parser.add_argument("--increment", help="comma-separated price_increment_percent values to try")
+    parser.add_argument("--decrement", help="comma-separated price_decrement_rate values to try")
+    parser.add_argument("--trace-products", type=int, default=5, help="products sampled for --trace-csv")
+    parser.add_argument("--trace-csv", metavar="FILE", help="write price trajectories here")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    if args.replay:
+        catalogue = load_replay_file(args.replay)
+    elif args.replay_mongo:
+        catalogue = load_replay_mongo()
+    else:
+        catalogue = synthetic_catalogue(args.products, args.events, args.hours, rng)
+
+    trace = ()
+    if args.trace_csv:
+        busiest = np.argsort(-catalogue.counts)
+        trace = busiest[:min(args.trace_products, len(catalogue))]
+
+    runs = []
+    started = time.perf_counter()
+    for increment, decrement in itertools.product(parse_values(args.increment), parse_values(args.decrement)):
+        runs.append(((increment, decrement), simulate(catalogue, increment, decrement, trace)))
+    elapsed = time.perf_counter() - started
+
+    report(catalogue, runs)
+    print(f"\n{len(runs)} run(s) in {elapsed:.2f}s")
+    if args.trace_csv:
+        write_traces(args.trace_csv, catalogue, runs)
+        print(f"✓ Trajectories written to {args.trace_csv}")
+
+
+if __name__ == "__main__":
+    main()